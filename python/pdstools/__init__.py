@@ -12,6 +12,7 @@ from pathlib import Path
 from .adm.ADMDatamart import ADMDatamart
 from .adm.ADMTrees import ADMTrees, MultiTrees
 from .adm.BinAggregator import BinAggregator
+from .adm.DatamartStore import DatamartStore
 from .decision_analyzer import DecisionData
 from .pega_io import API, S3, Anonymization, File, get_token, readDSExport
 from .pega_io.API import setupAzureOpenAI
@@ -35,6 +36,7 @@ __all__ = [
     "ADMTrees",
     "MultiTrees",
     "BinAggregator",
+    "DatamartStore",
     "DecisionData",
     "API",
     "S3",
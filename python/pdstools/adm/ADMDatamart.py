@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import copy
 import datetime
+import hashlib
+import json
 import logging
 import os
+import queue
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
 from io import BytesIO
 from pathlib import Path
 from typing import Any, Dict, List, Literal, NoReturn, Optional, Tuple, Union
@@ -14,7 +20,7 @@ import polars as pl
 import yaml
 from polars.exceptions import ColumnNotFoundError
 
-from .. import pega_io
+from .. import __version__, pega_io
 from ..plots.plot_base import Plots
 from ..plots.plots_plotly import ADMVisualisations as plotly_plot
 from ..utils import NBAD, cdh_utils
@@ -41,11 +47,14 @@ class ADMDatamart(Plots, Tables):
     ----------
     path : str, default = "."
         The path of the data files
-    import_strategy: Literal['eager', 'lazy'], default = 'eager'
+    import_strategy: Literal['eager', 'lazy', 'streaming'], default = 'eager'
         Whether to import the file fully to memory, or scan the file
         When data fits into memory, 'eager' is typically more efficient
         However, when data does not fit, the lazy methods typically allow
         you to still use the data.
+        With 'streaming', the data is scanned like with 'lazy', but
+        everything that does get collected is computed with the streaming
+        engine of Polars, in batches, so the working set stays bounded.
 
     Keyword arguments
     -----------------
@@ -76,6 +85,13 @@ class ADMDatamart(Plots, Tables):
         To extract these extra keys, set extract_keys to True.
     verbose : bool, default = False
         Whether to print out information during importing
+    cache_dir : Optional[Union[str, Path]], default = None
+        If given, the typed and capitalized tables imported from files are
+        cached in this directory, keyed by a fingerprint of the source file
+        and the import options. Later imports of the same, unchanged file
+        read the cache instead of parsing the export again. The aggregates
+        of the Health Check are cached here as well, see
+        :meth:`health_check_data`.
     **reading_opts
         Additional parameters used while reading.
         Refer to :meth:`pdstools.pega_io.File.import_file` for more info.
@@ -83,12 +99,18 @@ class ADMDatamart(Plots, Tables):
     Attributes
     ----------
     modelData : pl.LazyFrame
-        If available, holds the preprocessed data about the models
+        If available, holds the preprocessed data about the models.
+        In this and the other tables, ModelID is a Categorical that sorts
+        like the strings. To join them with a frame that has string
+        ModelIDs, cast one of the two sides first.
     predictorData : pl.LazyFrame
         If available, holds the preprocessed data about the predictor binning
     combinedData : pl.LazyFrame
         If both modelData and predictorData are available,
         holds the merged data about the models and predictors
+    predictorSnapshots : pl.LazyFrame
+        If the predictor data is compacted, the snapshot times of every
+        model, see :meth:`compact_predictor_data`
     import_strategy
         See the `import_strategy` parameter
     query
@@ -127,10 +149,38 @@ class ADMDatamart(Plots, Tables):
         x.model_name.upper() for x in NBAD.standardNBADModelConfigurations
     ]
 
+    # Number of query results memoized in the eager strategy,
+    # see pdstools.utils.cdh_utils.memoized_query
+    query_cache_size = 64
+    # Seconds that Quarto keeps an idle kernel alive between the reports of a
+    # batch. A worker starts its next report right away, so this is kept short:
+    # the kernels, each holding the datamart, exit soon after the batch.
+    quarto_daemon_timeout = 10
+    # The model data columns that a Health Check aggregate depends on, used to
+    # fingerprint it for the cache. Other aggregates depend on all columns.
+    health_check_inputs = {
+        "action_overview": [
+            "Name",
+            "Issue",
+            "Group",
+            "Treatment",
+            "Channel",
+            "Direction",
+        ],
+    }
+    # The Health Check aggregates that also depend on the predictor data
+    health_check_predictor_aggregates = (
+        "predictors_per_configuration",
+        "predictors_per_category",
+        "predictor_performance",
+        "missing_data",
+        "propensity_distribution",
+    )
+
     def __init__(
         self,
         path: Union[str, Path] = Path("."),
-        import_strategy: Literal["eager", "lazy"] = "eager",
+        import_strategy: Literal["eager", "lazy", "streaming"] = "eager",
         *,
         model_filename: Optional[str] = "modelData",
         predictor_filename: Optional[str] = "predictorData",
@@ -152,9 +202,12 @@ class ADMDatamart(Plots, Tables):
             str, Any
         ] = "plotly",  # TODO drop this, no plot engine abstraction
         verbose: bool = False,
+        cache_dir: Optional[Union[str, Path]] = None,
         **reading_opts,
     ):
         self.import_strategy = import_strategy
+        self.cache_dir = cache_dir
+        self.predictorSnapshots = None
         self.context_keys = context_keys
         self.verbose = verbose
         self.query = query
@@ -285,12 +338,17 @@ class ADMDatamart(Plots, Tables):
                 **reading_opts,
             )
         if df1 is not None:
+            # Already present when importing from a DatamartStore
+            df1_columns = df1.collect_schema().names()
             df1 = df1.with_columns(
                 (pl.col("Positives") / pl.col("ResponseCount"))
                 .fill_nan(pl.lit(0))
                 .alias("SuccessRate"),
-                self._last_timestamp("Positives"),
-                self._last_timestamp("ResponseCount"),
+                *[
+                    self._last_timestamp(col)
+                    for col in ["Positives", "ResponseCount"]
+                    if f"Last_{col}" not in df1_columns
+                ],
             )
         if predictor_df is not None:
             df2, self.renamed_preds, self.missing_preds = self._import_utils(
@@ -350,6 +408,12 @@ class ADMDatamart(Plots, Tables):
 
         return df1, df2
 
+    def _collect(self, df: any_frame) -> pl.DataFrame:
+        """Collects a frame, using the streaming engine in the streaming strategy."""
+        if isinstance(df, pl.DataFrame):
+            return df
+        return df.collect(streaming=self.import_strategy == "streaming")
+
     @property
     def is_available(self) -> bool:
         return len(self.modelData.head(1).collect()) > 0
@@ -404,6 +468,23 @@ class ADMDatamart(Plots, Tables):
         if isinstance(name, BytesIO):
             self.import_strategy = "eager"
 
+        cache_file = self._import_cache_file(
+            name,
+            path,
+            subset=subset,
+            extract_keys=extract_keys,
+            drop_cols=drop_cols,
+            include_cols=include_cols,
+            **reading_opts,
+        )
+        if cache_file is not None and cache_file.exists():
+            logger.info(f"Reading {name} from import cache {cache_file}")
+            df = self._scan_import_cache(cache_file)
+            with open(cache_file.with_suffix(".json")) as f:
+                columns = json.load(f)
+            cols, missing = set(columns["cols"]), set(columns["missing"])
+            return self._apply_import_query(df, name), cols, missing
+
         if isinstance(name, str) or isinstance(name, BytesIO):
             df = pega_io.readDSExport(
                 filename=name, path=path, verbose=self.verbose, **reading_opts
@@ -436,7 +517,15 @@ class ADMDatamart(Plots, Tables):
             strict_conversion=reading_opts.get("strict_conversion", True),
             table=reading_opts.get("typesetting_table", "infer"),
         )
+        if cache_file is not None:
+            df = self._write_import_cache(df, cache_file, cols, missing)
+
+        return self._apply_import_query(df, name), cols, missing
 
+    def _apply_import_query(
+        self, df: pl.LazyFrame, name: Union[str, any_frame]
+    ) -> pl.LazyFrame:
+        """Applies the global query to a freshly imported table, if any."""
         if self.query is not None:
             try:
                 df = self._apply_query(df, self.query)
@@ -450,7 +539,99 @@ class ADMDatamart(Plots, Tables):
                 and thus can't be successful for the other one. That should be fine
                 as the other table is likely queried correctly."""
                     )
-        return df, cols, missing
+        return df
+
+    def _import_cache_file(
+        self,
+        name: Union[str, any_frame],
+        path: Optional[str] = None,
+        **import_opts,
+    ) -> Optional[Path]:
+        """Location of the import cache entry for a file, if caching applies.
+
+        The cache key combines the fingerprint of the resolved source file
+        (see :meth:`pdstools.pega_io.File.get_file_fingerprint`), the import
+        options and the pdstools version, so any change to either of them
+        results in a new entry. Fingerprints are remembered per file size and
+        mtime, so unchanged files are not hashed again.
+
+        Parameters
+        ----------
+        name : Union[str, pl.DataFrame]
+            The file name as passed to :meth:`._import_utils`
+        path : str, default = None
+            The path of the data file
+
+        Keyword arguments
+        -----------------
+        The import options that influence the imported table
+
+        Returns
+        -------
+        Optional[Path]
+            The path to the (possibly not yet existing) cached table, or None
+            if there is no cache directory or the source is not a local file
+        """
+        if self.cache_dir is None or not isinstance(name, str):
+            return None
+        path = "." if path is None else path
+        if os.path.isfile(os.path.join(path, name)):
+            file = os.path.join(path, name)
+        else:
+            file = pega_io.get_latest_file(path, name)
+            if file is None or not os.path.isfile(file):
+                return None
+
+        cache_dir = Path(self.cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        file = os.path.abspath(file)
+        stat = os.stat(file)
+        index_file = cache_dir / "fingerprints.json"
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        entry = index.get(file)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            fingerprint = entry[2]
+        else:
+            fingerprint = pega_io.get_file_fingerprint(file)
+            index[file] = [stat.st_size, stat.st_mtime_ns, fingerprint]
+            tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, index_file)
+
+        key = json.dumps(
+            {"version": __version__, "file": fingerprint, **import_opts},
+            sort_keys=True,
+            default=str,
+        )
+        return cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.arrow"
+
+    @staticmethod
+    def _write_import_cache(
+        df: pl.LazyFrame, cache_file: Path, cols: set, missing: set
+    ) -> pl.LazyFrame:
+        """Writes an imported table to the import cache and scans it back."""
+        tmp_file = pega_io.cache_to_file(
+            df, cache_file.parent, name=f"{cache_file.stem}.{os.getpid()}"
+        )
+        with open(cache_file.with_suffix(".json"), "w") as f:
+            json.dump({"cols": sorted(cols), "missing": sorted(missing)}, f)
+        os.replace(tmp_file, cache_file)
+        logger.info(f"Wrote import cache {cache_file}")
+        return ADMDatamart._scan_import_cache(cache_file)
+
+    @staticmethod
+    def _scan_import_cache(cache_file: Path) -> pl.LazyFrame:
+        """Scans an import cache file, restoring the ordering of ModelID."""
+        # Arrow files do not keep the lexical ordering of categoricals
+        df = pl.scan_ipc(cache_file)
+        if "ModelID" in df.collect_schema().names():
+            df = df.with_columns(pl.col("ModelID").cast(pl.Categorical("lexical")))
+        return df
 
     def _available_columns(
         self,
@@ -567,6 +748,7 @@ class ADMDatamart(Plots, Tables):
             df = df.with_columns(SnapshotTime=None)
         return df
 
+    @cdh_utils.memoized_query
     def last(
         self, table="modelData", strategy: Literal["eager", "lazy"] = "eager"
     ) -> any_frame:
@@ -597,11 +779,18 @@ class ADMDatamart(Plots, Tables):
             df = self._last(getattr(self, table))
         else:  # pragma: no cover
             raise ValueError("This should not happen, please file a GitHub issue :).")
-        return df if not strategy == "eager" else df.collect()
+        return df if not strategy == "eager" else self._collect(df)
 
     @staticmethod
     def _last(df: any_frame) -> any_frame:
         """Method to retrieve only the last snapshot."""
+        if "ValidTo" in df.collect_schema().names():
+            # Compacted predictor data, see compact_predictor_data
+            return (
+                df.filter(pl.col("ValidTo") == pl.col("ValidTo").max())
+                .drop("SnapshotTime", "ValidFrom", strict=False)
+                .rename({"ValidTo": "SnapshotTime"})
+            )
         if df.select("SnapshotTime").collect_schema().dtypes()[0] == pl.datatypes.Null:
             return df
 
@@ -628,6 +817,39 @@ class ADMDatamart(Plots, Tables):
             .alias(f"Last_{col}")
         )
 
+    @property
+    def modelData(self) -> Optional[pl.LazyFrame]:
+        return self.__dict__.get("_modelData")
+
+    @modelData.setter
+    def modelData(self, df: Optional[pl.LazyFrame]):
+        # Results derived from the previous table are no longer valid
+        self.clear_query_cache()
+        self.__dict__.pop("combinedData", None)
+        self._modelData = df
+
+    @property
+    def predictorData(self) -> Optional[pl.LazyFrame]:
+        return self.__dict__.get("_predictorData")
+
+    @predictorData.setter
+    def predictorData(self, df: Optional[pl.LazyFrame]):
+        self.clear_query_cache()
+        self.__dict__.pop("combinedData", None)
+        self._predictorData = df
+
+    @cached_property
+    def combinedData(self) -> any_frame:
+        """The last snapshots of the model data joined with the predictor data.
+
+        Built from the current tables when first used, and cached until the
+        tables are processed again, see :meth:`.processTables`. The attribute
+        does not exist unless both tables are available.
+        """
+        if self.predictorData is None or self.modelData is None:
+            raise AttributeError("combinedData needs both model and predictor data")
+        return self._get_combined_data(strategy=self.import_strategy)
+
     def _get_combined_data(
         self, last=True, strategy: Literal["eager", "lazy"] = "eager"
     ) -> any_frame:
@@ -665,7 +887,9 @@ class ADMDatamart(Plots, Tables):
         Can take in a query, which it will apply to modelData
         If a query is given, it joins predictorData to only retain the modelIDs
         the modelData was filtered on. If both modelData and predictorData
-        are present, it joins them together into combinedData.
+        are present, they can be joined together into combinedData, which is
+        only done when it is first used.
+        As the tables change, this also clears the memoized query results.
 
         If memory_strategy is eager, which is the default, this method also
         collects the tables and then sets them back to lazy.
@@ -677,6 +901,7 @@ class ADMDatamart(Plots, Tables):
             See: :meth:`._apply_query`
 
         """
+        self.clear_query_cache()
         if self.modelData is not None:
             if query is not None:
                 self.modelData = self._apply_query(self.modelData, query)
@@ -690,23 +915,81 @@ class ADMDatamart(Plots, Tables):
                 )
             if self.import_strategy == "eager":
                 self.predictorData = self.predictorData.collect().lazy()
+        if self.predictorSnapshots is not None:
+            if query is not None:
+                self.predictorSnapshots = self.predictorSnapshots.join(
+                    self.modelData.select(pl.col("ModelID").unique()), on="ModelID"
+                )
+            if self.import_strategy == "eager":
+                self.predictorSnapshots = self.predictorSnapshots.collect().lazy()
 
-        if self.predictorData is not None and self.modelData is not None:
-            self.combinedData = self._get_combined_data(strategy=self.import_strategy)
-        elif self.verbose:
+        # Derived from the tables, so recomputed when first used again
+        self.__dict__.pop("combinedData", None)
+        self.__dict__.pop("hasMultipleSnapshots", None)
+        if (self.predictorData is None or self.modelData is None) and self.verbose:
             print(
                 "Could not be combined. Do you have both model data and predictor data?"
             )
 
         return self
 
-    def save_data(self, path: str = ".") -> Tuple[os.PathLike, os.PathLike]:
+    def compact_predictor_data(self) -> ADMDatamart:
+        """Compacts the predictor binning history into validity intervals.
+
+        Every (ModelID, PredictorName, BinIndex) row is only kept when it
+        changes, with the first and last snapshot of each run of identical
+        values in `ValidFrom` and `ValidTo`, instead of a `SnapshotTime`.
+        See :func:`pdstools.utils.cdh_utils.compact_snapshots`.
+
+        The compacted table is used as is by :meth:`last`, and so by the
+        combined data and the predictor tables. Plots over all snapshots
+        expand it again against the snapshot times of every model, which are
+        kept in `predictorSnapshots`, see
+        :func:`pdstools.utils.cdh_utils.expand_snapshots`.
+        Saved with :meth:`save_data`, it can be read back by including the
+        `ValidFrom` and `ValidTo` columns in `include_cols`. The snapshot
+        times are not saved, so after reading it back the plots only show
+        the snapshots in which any bin of a model changed.
+
+        Returns
+        -------
+        ADMDatamart
+            The datamart, with the compacted predictor data
+        """
+        if self.predictorData is None:
+            return self
+        if "ValidTo" not in self.predictorData.collect_schema().names():
+            self.predictorData, self.predictorSnapshots = cdh_utils.compact_snapshots(
+                self.predictorData
+            )
+        return self.processTables()
+
+    def clear_query_cache(self):
+        """Clears the memoized results of queries on this datamart.
+
+        See :func:`pdstools.utils.cdh_utils.memoized_query`. This is done
+        automatically when `modelData` or `predictorData` are assigned, but
+        should be called when modifying the tables in any other way.
+        """
+        self.__dict__.pop("_query_cache", None)
+
+    def save_data(
+        self, path: str = ".", partitioned: bool = False
+    ) -> Tuple[os.PathLike, os.PathLike]:
         """Cache modelData and predictorData to files.
 
         Parameters
         ----------
         path : str
             Where to place the files
+        partitioned : bool, default = False
+            Whether to write hive-partitioned Parquet datasets, partitioned by
+            Configuration and snapshot date, instead of a single Arrow file
+            per table. Tables without a snapshot time for every row are
+            partitioned by Configuration only. The Configuration of each model
+            is added to the predictor data, so it can be partitioned likewise.
+            When read back with :meth:`pega_io.File.readDSExport`, filters on
+            these columns only read the relevant files.
 
         Returns
         -------
@@ -714,13 +997,59 @@ class ADMDatamart(Plots, Tables):
             The paths to the model and predictor data files
         """
         time = datetime.datetime.now().strftime("%Y%m%dT%H%M%S.%f")[:-3]
+        cache_opts = dict(streaming=self.import_strategy == "streaming")
+
+        def partition(df: pl.LazyFrame, time_col: str) -> pl.LazyFrame:
+            """Adds the snapshot date, if every row has a snapshot time."""
+            if time_col in df.collect_schema().names() and (
+                df.select(pl.col(time_col).null_count()).collect().item() == 0
+            ):
+                df = df.with_columns(pl.col(time_col).dt.date().alias("SnapshotDate"))
+            else:
+                logger.warning(
+                    f"No {time_col} for every row, so partitioning by "
+                    "Configuration only."
+                )
+            cache_opts["partition_by"] = [
+                col
+                for col in ["Configuration", "SnapshotDate"]
+                if col in df.collect_schema().names()
+            ]
+            return df
+
+        if partitioned:
+            cache_opts.update(cache_type="parquet", compression="zstd")
         if self.modelData is not None:
+            modelData = self.modelData
+            if partitioned:
+                modelData = partition(modelData, "SnapshotTime")
             modeldata_cache = pega_io.cache_to_file(
-                self.modelData, path, name=f"cached_modelData_{time}"
+                modelData, path, name=f"cached_modelData_{time}", **cache_opts
             )
         if self.predictorData is not None:
+            predictorData = self.predictorData
+            if partitioned:
+                if (
+                    "Configuration" not in predictorData.collect_schema().names()
+                    and self.modelData is not None
+                ):
+                    predictorData = predictorData.join(
+                        self.modelData.select("ModelID", "Configuration").unique(
+                            "ModelID"
+                        ),
+                        on="ModelID",
+                        how="left",
+                    )
+                predictorData = partition(
+                    predictorData,
+                    (
+                        "ValidFrom"
+                        if "ValidFrom" in predictorData.collect_schema().names()
+                        else "SnapshotTime"
+                    ),
+                )
             predictordata_cache = pega_io.cache_to_file(
-                self.predictorData, path, name=f"cached_predictorData_{time}"
+                predictorData, path, name=f"cached_predictorData_{time}", **cache_opts
             )
         else:
             predictordata_cache = None
@@ -740,8 +1069,9 @@ class ADMDatamart(Plots, Tables):
         query: Optional[Union[pl.Expr, List[pl.Expr], str, Dict[str, list]]]
             If a Polars Expression, passes the expression into Polars' filter function.
             If a list of Polars Expressions, applies each of the expressions as filters.
-            If a string, uses the Pandas query function (works only in eager mode,
-            not recommended).
+            If a string, or a list of strings, translates them into Polars
+            expressions. Both the pandas query syntax and SQL conditions are
+            supported, see :func:`pdstools.utils.cdh_utils._query_to_expr`.
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         Returns
@@ -755,6 +1085,9 @@ class ADMDatamart(Plots, Tables):
         else:
             df_cols = df.collect_schema().names()
         if query is not None:
+            if isinstance(query, str):
+                query = cdh_utils._query_to_expr(query)
+
             if isinstance(query, pl.Expr):
                 col_diff = set(query.meta.root_names()) - set(df_cols)
                 if len(col_diff) == 0:
@@ -764,6 +1097,8 @@ class ADMDatamart(Plots, Tables):
 
             if isinstance(query, list):
                 for item in query:
+                    if isinstance(item, str):
+                        item = cdh_utils._query_to_expr(item)
                     if isinstance(item, pl.Expr):
                         col_diff = set(item.meta.root_names()) - set(df_cols)
                         if len(col_diff) == 0:
@@ -774,22 +1109,6 @@ class ADMDatamart(Plots, Tables):
                         raise ValueError(item)
                 return df
 
-            if isinstance(query, str):
-                print(
-                    "Pandas query detected. This will be slow, and only works in eager mode ",
-                    "because we turn the dataframe to pandas, query, and then turn it back ",
-                    "to Polars. For faster performance, please pass a Polars Expression ",
-                    "which can be used in the `filter()` method.",
-                )
-                if not self.import_strategy == "eager":
-                    raise NotEagerError("Applying pandas queries")
-                else:
-                    return pl.LazyFrame(
-                        df.collect()
-                        .to_pandas(use_pyarrow_extension_array=True)
-                        .query(query)
-                    )
-
             if not isinstance(query, dict):
                 raise TypeError("query must be a dict where values are lists")
             for val in query.values():
@@ -805,13 +1124,20 @@ class ADMDatamart(Plots, Tables):
         return df
 
     def discover_modelTypes(
-        self, df: pl.LazyFrame, by: str = "Configuration", allow_collect=False
+        self,
+        df: pl.LazyFrame,
+        by: str = "Configuration",
+        allow_collect=False,
+        n_threads: Optional[int] = None,
     ) -> Dict:  # pragma: no cover
         """Discovers the type of model embedded in the pyModelData column.
 
         By default, we do a group_by Configuration, because a model rule can only
         contain one type of model. Then, for each configuration, we look into the
         pyModelData blob and find the _serialClass, returning it in a dict.
+        The blobs are only decompressed up to the _serialClass, in a thread pool,
+        and the types are cached per blob, see
+        :func:`pdstools.utils.cdh_utils._model_type`.
 
         Parameters
         ----------
@@ -822,6 +1148,9 @@ class ADMDatamart(Plots, Tables):
         allow_collect: bool, default = False
             Set to True to allow discovering modelTypes, even if in lazy strategy.
             It will fetch one modelData string per configuration.
+        n_threads: Optional[int], default = None
+            The number of threads to inspect the blobs with.
+            By default, uses the default of `ThreadPoolExecutor`.
         """
         if self.import_strategy != "eager" and allow_collect == False:
             raise NotEagerError("Discovering AGB models")
@@ -834,34 +1163,23 @@ class ADMDatamart(Plots, Tables):
                 )
             )
 
-        def _getType(val):
-            import base64
-            import zlib
-
-            return next(
-                line.split('"')[-2].split(".")[-1]
-                for line in zlib.decompress(base64.b64decode(val)).decode().split("\n")
-                if line.startswith('  "_serialClass"')
-            )
-
         if isinstance(df, pl.DataFrame):
             df = df.lazy()
 
-        types = (
+        blobs = self._collect(
             df.filter(pl.col("Modeldata").is_not_null())
             .group_by(by)
             .agg(pl.col("Modeldata").last())
-            .collect()
-            .with_columns(pl.col("Modeldata").map_elements(lambda v: _getType(v)))
-            .to_dicts()
         )
-        return {key: value for key, value in [i.values() for i in types]}
+        with ThreadPoolExecutor(n_threads) as pool:
+            types = pool.map(cdh_utils._model_type, blobs["Modeldata"])
+        return dict(zip(blobs[by].to_list(), types))
 
     def get_AGB_models(
         self,
         last: bool = False,
         by: str = "Configuration",
-        n_threads: int = 1,
+        n_threads: Optional[int] = None,
         query: Optional[Union[pl.Expr, List[pl.Expr], str, Dict[str, list]]] = None,
         verbose: bool = True,
         **kwargs,
@@ -879,10 +1197,9 @@ class ADMDatamart(Plots, Tables):
             Whether to only look at the last snapshot for each model
         by: str, default = 'Configuration'
             Which column to determine unique models with
-        n_threads: int, default = 6
-            The number of threads to use for extracting the models.
-            Since we use multithreading, setting this to a reasonable value
-            helps speed up the import.
+        n_threads: int, optional
+            Deprecated and no longer used: the snapshots of the models are
+            only decoded when accessed, see :class:`pdstools.adm.ADMTrees.MultiTrees`.
         query: Optional[Union[pl.Expr, List[pl.Expr], str, Dict[str, list]]]
             Please refer to :meth:`._apply_query`
         verbose: bool, default = False
@@ -899,7 +1216,7 @@ class ADMDatamart(Plots, Tables):
         ]
         logger.info(f"Found AGB models: {AGB_models}")
         df = df.filter(pl.col("Configuration").is_in(AGB_models))
-        if df.select(pl.col("ModelID").n_unique()).collect().item() == 0:
+        if self._collect(df.select(pl.col("ModelID").n_unique())).item() == 0:
             raise ValueError("No models found.")
 
         if last:
@@ -908,7 +1225,7 @@ class ADMDatamart(Plots, Tables):
             )
         else:
             return ADMTrees(
-                df.select("Configuration", "SnapshotTime", "Modeldata").collect(),
+                self._collect(df.select("Configuration", "SnapshotTime", "Modeldata")),
                 n_threads=n_threads,
                 verbose=verbose,
                 **kwargs,
@@ -983,6 +1300,7 @@ class ADMDatamart(Plots, Tables):
             df = df.with_columns((pl.all().exclude([by, "SnapshotTime"]).sign()))
         return df
 
+    @cdh_utils.memoized_query
     def model_summary(
         self,
         by: str = "ModelID",
@@ -1065,7 +1383,7 @@ class ADMDatamart(Plots, Tables):
             If a list is provided, only the first element is used.
         allow_collect : bool, default = True
             Whether to allow eager computation.
-            If set to False and the import strategy is "lazy", an error will be raised.
+            If set to False and the import strategy is not "eager", an error will be raised.
         top_n : int, optional (default=0)
             The number of rows to include in the pivoted DataFrame.
             If set to 0, all rows are included.
@@ -1078,7 +1396,7 @@ class ADMDatamart(Plots, Tables):
 
         if isinstance(by, list):
             by = by[0]
-        if self.import_strategy == "lazy" and not allow_collect:
+        if self.import_strategy != "eager" and not allow_collect:
             raise NotEagerError("Pivot df.")
 
         df = df.filter(pl.col("PredictorName") != "Classifier").with_columns(
@@ -1095,7 +1413,7 @@ class ADMDatamart(Plots, Tables):
                 )
             )
         df = (
-            df.collect()
+            self._collect(df)
             .pivot(
                 index=by,
                 on="PredictorName",
@@ -1161,17 +1479,17 @@ class ADMDatamart(Plots, Tables):
         by : str, default = Channel
             The column name to group the DataFrame by, by default "Channel"
         allow_collect : bool, default = True
-            Whether to allow eager computation. If set to False and the import strategy is "lazy", an error will be raised.
+            Whether to allow eager computation. If set to False and the import strategy is not "eager", an error will be raised.
 
         Returns
         -------
         pl.LazyFrame
            DataFrame with PositivesBin column and model count statistics
         """
-        if self.import_strategy == "lazy" and not allow_collect:
+        if self.import_strategy != "eager" and not allow_collect:
             raise NotEagerError("Models by positive df.")
 
-        modelsByPositives = df.select([by, "Positives", "ModelID"]).collect()
+        modelsByPositives = self._collect(df.select([by, "Positives", "ModelID"]))
         return (
             modelsByPositives.with_columns(
                 PositivesBin=modelsByPositives["Positives"].cut(
@@ -1214,7 +1532,7 @@ class ADMDatamart(Plots, Tables):
         if self.modelData is None:
             raise ValueError("No model data to analyze.")
 
-        data = self.last(self.modelData) if last else self.modelData
+        data = self.last(self.modelData) if last else self._collect(self.modelData)
 
         ret = dict()
         ret["models_n_snapshots"] = data.select(pl.n_unique("SnapshotTime")).item()
@@ -1309,6 +1627,7 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
         )
         return self.processTables()
 
+    @cdh_utils.memoized_query
     def summary_by_channel(
         self,
         custom_channels: Dict[str, str] = None,
@@ -1557,9 +1876,9 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             )
         )
 
-        item_overlap_actions = channel_summary.select(
-            ["AllActions", "isValid"]
-        ).collect()
+        item_overlap_actions = self._collect(
+            channel_summary.select(["AllActions", "isValid"])
+        )
 
         return channel_summary.with_columns(
             pl.Series(
@@ -1585,6 +1904,7 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             )
         )
 
+    @cdh_utils.memoized_query
     def overall_summary(
         self, custom_channels: Dict[str, str] = None, by_period: str = None
     ) -> pl.LazyFrame:
@@ -1616,27 +1936,27 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
         # Re-calculating here because the use of NBAD in the channel
         # summary does not currently take into account the omni adaptive model
         usesNBAD = (
-            self.modelData.select(
-                pl.col("Configuration")
-                .cast(pl.Utf8)
-                .str.to_uppercase()
-                .is_in(self.NBAD_model_configurations)
-                .any()
-            )
-            .collect()
-            .item()
+            self._collect(
+                self.modelData.select(
+                    pl.col("Configuration")
+                    .cast(pl.Utf8)
+                    .str.to_uppercase()
+                    .is_in(self.NBAD_model_configurations)
+                    .any()
+                )
+            ).item()
         )
 
         usesNBADOnly = (
-            self.modelData.select(
-                pl.col("Configuration")
-                .cast(pl.Utf8)
-                .str.to_uppercase()
-                .is_in(self.NBAD_model_configurations)
-                .all()
-            )
-            .collect()
-            .item()
+            self._collect(
+                self.modelData.select(
+                    pl.col("Configuration")
+                    .cast(pl.Utf8)
+                    .str.to_uppercase()
+                    .is_in(self.NBAD_model_configurations)
+                    .all()
+                )
+            ).item()
         )
 
         return (
@@ -1683,6 +2003,398 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             .sort(["Period"] if by_period is not None else [])
         )
 
+    def _health_check_aggregates(self) -> Dict[str, pl.LazyFrame]:
+        """The aggregates of the Health Check report, as lazy queries."""
+        model_cols = self.modelData.collect_schema().names()
+
+        def existing(cols: List[str]) -> List[str]:
+            return [col for col in cols if col in model_cols]
+
+        def number(fld: List[str], grouping: Optional[List[str]] = None, agg="max"):
+            fld = existing(fld)
+            if grouping is not None:
+                grouping = existing(grouping)
+            if not fld or grouping == []:
+                return pl.LazyFrame({"Number": [0.0]})
+            if grouping is None:
+                return (
+                    self.modelData.select(fld)
+                    .drop_nulls()
+                    .unique()
+                    .select(pl.len().cast(pl.Float64).alias("Number"))
+                )
+            return (
+                self.modelData.group_by(grouping)
+                .agg(pl.col(fld[0]).drop_nulls().n_unique())
+                .select(getattr(pl.col(fld[0]), agg)().cast(pl.Float64).alias("Number"))
+            )
+
+        def values(fld: Optional[List[str]] = None, n: int = 6):
+            fld = existing(fld or [])
+            if not fld:
+                return pl.LazyFrame(
+                    {"Values": [None]}, schema={"Values": pl.List(pl.Utf8)}
+                )
+            return self.modelData.select(
+                pl.concat_str(fld, separator="/")
+                .drop_nulls()
+                .unique()
+                .sort()
+                .head(n)
+                .implode()
+                .alias("Values")
+            )
+
+        action_overview = [
+            ("Overall Number of Actions", number(["Name"]), values(["Name"])),
+            (
+                "Max number of Actions within an Issue and Group",
+                number(["Name"], ["Issue", "Group"]),
+                values(),
+            ),
+            (
+                "Number of Treatments across all Actions",
+                number(["Treatment"]),
+                values(["Treatment"]),
+            ),
+            (
+                "Max number of Treatments per Channel",
+                number(["Treatment"], ["Channel", "Direction"]),
+                values(),
+            ),
+            (
+                "Max number of Treatments per Channel for any single Action",
+                number(["Treatment"], ["Name"]),
+                values(),
+            ),
+            ("Number of unique Issues", number(["Issue"]), values(["Issue"])),
+            (
+                "Average number of Groups per Issue",
+                number(["Group"], ["Issue"], agg="mean"),
+                values(["Group"]),
+            ),
+            ("Max number of Groups per Issue", number(["Group"], ["Issue"]), values()),
+            (
+                "Channels",
+                number(["Channel", "Direction"]),
+                values(["Channel", "Direction"]),
+            ),
+        ]
+
+        channel_overview = self.summary_by_channel()
+        invalid_channels = channel_overview.filter(pl.col("isValid").not_()).select(
+            "Channel", "Direction"
+        )
+
+        aggregates = {
+            "last_data": self.last(strategy="lazy")
+            .with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+            .with_columns(
+                pl.col(pl.Utf8).fill_null("NA"),
+                pl.col(pl.Null).fill_null("NA"),
+                pl.col("SuccessRate").fill_nan(0).fill_null(0),
+                pl.col("Performance").fill_nan(0).fill_null(0),
+                pl.col("ResponseCount").fill_null(0),
+                pl.concat_str("Channel", "Direction", separator="/").alias(
+                    "Channel/Direction"
+                ),
+            ),
+            "channel_overview": channel_overview,
+            "action_overview": pl.concat(
+                [
+                    pl.concat(
+                        [pl.LazyFrame({"Item": [item]}), n_unique, sample_values],
+                        how="horizontal",
+                    )
+                    for item, n_unique, sample_values in action_overview
+                ]
+            ),
+            # Models in channels that are excluded from the report are left out
+            "configuration_overview": self.modelData.join(
+                invalid_channels, on=["Channel", "Direction"], how="anti"
+            )
+            .group_by("Configuration")
+            .agg(pl.max("ResponseCount").alias("Responses"), pl.max("Positives")),
+        }
+        if self.predictorData is not None:
+            aggregates.update(self._health_check_predictor_aggregates())
+        return aggregates
+
+    def _health_check_predictor_aggregates(self) -> Dict[str, pl.LazyFrame]:
+        """The predictor aggregates of the Health Check report, as lazy queries."""
+        combined = self._get_combined_data(strategy="lazy")
+        combined_cols = combined.collect_schema().names()
+        predictors = combined.filter(pl.col("EntryType") != "Classifier")
+        path = [
+            col
+            for col in ["Configuration", "PredictorCategory", "PredictorName"]
+            if col in combined_cols
+        ]
+        propensity = (
+            "Propensity"
+            if "Propensity" in self.predictorData.collect_schema().names()
+            else "BinPropensity"
+        )
+        aggregates = {
+            "predictors_per_configuration": predictors.group_by("Configuration")
+            .agg(
+                pl.col("PredictorName").n_unique().alias("Predictor Count"),
+                *[
+                    pl.col(col).unique().alias(alias)
+                    for col, alias in [
+                        ("Channel", "Used in (Channels)"),
+                        ("Issue", "Used for (Issues)"),
+                    ]
+                    if col in combined_cols
+                ],
+            )
+            .sort("Configuration"),
+            "predictors_per_category": predictors.group_by(
+                "Configuration", "PredictorCategory"
+            )
+            .agg(pl.col("PredictorName").n_unique().alias("Predictor Count"))
+            .sort("Configuration", "PredictorCategory"),
+            # Over all snapshots, unlike the other predictor aggregates
+            "predictor_performance": self.predictorData.filter(
+                pl.col("PredictorName") != "Classifier"
+            )
+            .group_by("PredictorName")
+            .agg(
+                pl.sum("BinResponseCount").alias("ResponseCount"),
+                (pl.min("Performance") * 100).alias("Min"),
+                (pl.mean("Performance") * 100).alias("Mean"),
+                (pl.median("Performance") * 100).alias("Median"),
+                (pl.max("Performance") * 100).alias("Max"),
+            )
+            .sort("Mean", "PredictorName"),
+            "missing_data": combined.filter(pl.col("PredictorName") != "Classifier")
+            .group_by(path)
+            .agg(
+                pl.col("BinResponseCount")
+                .filter(pl.col("BinSymbol") == "MISSING")
+                .sum()
+                .alias("MissingCount"),
+                pl.sum("BinResponseCount").alias("PredictorResponseCount"),
+            )
+            .with_columns(
+                (pl.col("MissingCount") / pl.col("PredictorResponseCount")).alias(
+                    "Percentage without responses"
+                )
+            )
+            .filter(~pl.col("Percentage without responses").is_nan())
+            .sort(path),
+            "propensity_distribution": combined.filter(
+                pl.col("PredictorName") != "Classifier"
+            )
+            .group_by(propensity, "Channel", "Direction")
+            .agg(pl.sum("BinResponseCount"))
+            .with_columns(pl.col(propensity).round(4).cast(pl.Float64))
+            .sort(propensity, "Channel", "Direction", "BinResponseCount"),
+        }
+        # Stored as strings, so the bundle does not depend on the string cache
+        return {
+            name: df.with_columns(
+                pl.col(pl.Categorical).cast(pl.Utf8),
+                pl.col(pl.List(pl.Categorical)).cast(pl.List(pl.Utf8)),
+            )
+            for name, df in aggregates.items()
+        }
+
+    def health_check_data(
+        self, names: Optional[List[str]] = None, fill_missing: bool = True
+    ) -> Dict[str, pl.DataFrame]:
+        """Computes the aggregates that the Health Check report shows.
+
+        All aggregates are collected together, with one `pl.collect_all`, so
+        the scans and joins they share are only computed once. Like in the
+        report, missing values are filled first, see :meth:`fillMissing`.
+
+        With a `cache_dir`, computed aggregates are cached there, and only
+        the aggregates whose inputs changed since the last run are computed
+        again. See :meth:`_health_check_cache_files`.
+
+        Parameters
+        ----------
+        names : List[str], optional
+            Only compute these aggregates. By default computes all of them:
+            'last_data', 'channel_overview', 'action_overview' and
+            'configuration_overview' and, if there is predictor data, the
+            predictor aggregates in `health_check_predictor_aggregates`.
+        fill_missing : bool, default = True
+            Whether to fill missing values first. The report does not do so
+            again after it excluded models from a datamart that was filled.
+
+        Returns
+        -------
+        Dict[str, pl.DataFrame]
+            The aggregates by name
+        """
+        dm = copy.copy(self).fillMissing() if fill_missing else self
+        aggregates = dm._health_check_aggregates()
+        if names is not None:
+            aggregates = {name: aggregates[name] for name in names}
+        cache_files = dm._health_check_cache_files(list(aggregates.keys()))
+
+        results = {
+            name: pl.read_parquet(file)
+            for name, file in cache_files.items()
+            if file.exists()
+        }
+        if results:
+            logger.info(f"Reusing cached Health Check aggregates {list(results)}")
+        todo = {name: df for name, df in aggregates.items() if name not in results}
+        frames = pl.collect_all(
+            todo.values(), streaming=self.import_strategy == "streaming"
+        )
+        for name, df in zip(todo.keys(), frames):
+            results[name] = df
+            if name in cache_files:
+                self._write_health_check_cache(df, cache_files[name])
+        return {name: results[name] for name in aggregates}
+
+    def _health_check_cache_files(self, names: List[str]) -> Dict[str, Path]:
+        """Locations of the cache entries for Health Check aggregates.
+
+        Every aggregate is keyed by a fingerprint of its inputs: an order
+        independent hash over the rows of the model data columns it depends
+        on (see `health_check_inputs`), of the predictor data for the
+        predictor aggregates, the context keys and the pdstools and Polars
+        versions. When a day of new snapshots only changes some of the
+        inputs, only the aggregates depending on them get a new entry.
+
+        Parameters
+        ----------
+        names : List[str]
+            The names of the aggregates
+
+        Returns
+        -------
+        Dict[str, Path]
+            The (possibly not yet existing) cache entry per aggregate, empty
+            if there is no cache directory
+        """
+        if self.cache_dir is None or self.modelData is None or not names:
+            return {}
+        model_cols = self.modelData.collect_schema().names()
+        inputs = {
+            name: tuple(
+                col
+                for col in self.health_check_inputs.get(name, model_cols)
+                if col in model_cols
+            )
+            for name in names
+        }
+        subsets = [("modelData", cols) for cols in set(inputs.values())]
+        if self.predictorData is not None and any(
+            name in self.health_check_predictor_aggregates for name in names
+        ):
+            predictor_cols = tuple(self.predictorData.collect_schema().names())
+            subsets.append(("predictorData", predictor_cols))
+
+        def fingerprint(table: str, cols: Tuple[str]) -> pl.LazyFrame:
+            # Columns are hashed separately, as nested columns cannot be hashed
+            # as part of a struct, and categoricals as strings so the hash does
+            # not depend on the order in which the string cache was filled.
+            df = getattr(self, table)
+            schema = df.collect_schema()
+            return df.select(
+                pl.struct(
+                    [
+                        pl.col(col).cast(pl.Utf8).hash(seed=0)
+                        if schema[col] == pl.Categorical
+                        else pl.col(col).hash(seed=0)
+                        for col in cols
+                    ]
+                )
+                .hash(seed=0)
+                .sum()
+                .alias("hash"),
+                pl.len().alias("rows"),
+            )
+
+        hashes = pl.collect_all(
+            [fingerprint(table, cols) for table, cols in subsets],
+            streaming=self.import_strategy == "streaming",
+        )
+        fingerprints = dict(zip(subsets, [df.row(0) for df in hashes]))
+
+        cache_dir = Path(self.cache_dir) / "health_check"
+        cache_files = {}
+        for name, cols in inputs.items():
+            key = json.dumps(
+                {
+                    "version": __version__,
+                    "polars": pl.__version__,
+                    "aggregate": name,
+                    "context_keys": self.context_keys,
+                    "columns": cols,
+                    "data": fingerprints[("modelData", cols)],
+                    "predictors": (
+                        fingerprints[("predictorData", predictor_cols)]
+                        if name in self.health_check_predictor_aggregates
+                        else None
+                    ),
+                },
+                sort_keys=True,
+                default=str,
+            )
+            digest = hashlib.sha1(key.encode()).hexdigest()
+            cache_files[name] = cache_dir / f"{name}_{digest}.parquet"
+        return cache_files
+
+    @staticmethod
+    def _write_health_check_cache(df: pl.DataFrame, cache_file: Path):
+        """Writes a Health Check aggregate to the cache, replacing older entries."""
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        name = cache_file.stem.rsplit("_", 1)[0]
+        for old_file in cache_file.parent.glob(f"{name}_*.parquet"):
+            old_file.unlink(missing_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        df.write_parquet(tmp_file)
+        os.replace(tmp_file, cache_file)
+        logger.info(f"Wrote Health Check cache {cache_file}")
+
+    def save_health_check_data(self, path: Union[str, Path] = ".") -> Path:
+        """Precomputes the Health Check aggregates and saves them as Parquet files.
+
+        The Health Check report reads this bundle, when it is present, instead
+        of computing the aggregates itself. See :meth:`health_check_data`.
+
+        Parameters
+        ----------
+        path : Union[str, Path], default = "."
+            Where to create the `health_check_data` directory
+
+        Returns
+        -------
+        Path
+            The directory with one Parquet file per aggregate
+        """
+        directory = Path(path) / "health_check_data"
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, df in self.health_check_data().items():
+            df.write_parquet(directory / f"{name}.parquet")
+        return directory
+
+    @staticmethod
+    def read_health_check_data(path: Union[str, Path]) -> Dict[str, pl.DataFrame]:
+        """Reads a bundle written by :meth:`save_health_check_data`.
+
+        Parameters
+        ----------
+        path : Union[str, Path]
+            The `health_check_data` directory
+
+        Returns
+        -------
+        Dict[str, pl.DataFrame]
+            The aggregates by name
+        """
+        return {
+            file.stem: pl.read_parquet(file)
+            for file in sorted(Path(path).glob("*.parquet"))
+        }
+
     def generate_model_reports(
         self,
         name: Optional[str] = None,
@@ -1694,6 +2406,8 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
         output_type: str = "html",
         keep_temp_files: bool = False,
         progress_callback=None,  #:  Callable[[int, int], None] = None,
+        n_workers: Optional[int] = None,
+        keep_kernel: bool = True,
         **kwargs,
     ) -> Path:
         """
@@ -1715,8 +2429,23 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             The type of the output file (e.g., "html", "pdf").
         keep_temp_files : bool, optional
             If True, the temporary directory with temp files will not be deleted after report generation.
+        progress_callback : Callable[[int, int], None], optional
+            Called with the number of finished reports and the total number of
+            reports, every time a report is finished.
+        n_workers : int, optional
+            The number of reports to render concurrently. Every worker renders
+            in its own temporary directory, while the data is saved only once
+            and shared by all workers. Defaults to the number of CPUs, up to 4.
+        keep_kernel : bool, default=True
+            Whether every worker keeps its Python kernel alive between its
+            reports, using Quarto's `--execute-daemon`. The imports and the
+            datamart are then loaded only once per worker, rather than once per
+            report. Only applies when a worker renders more than one report.
+            The kernels exit once they have been idle for
+            `quarto_daemon_timeout` seconds.
         **kwargs : dict
-            Additional keyword arguments.
+            Additional keyword arguments. The Quarto output is printed only
+            with `verbose=True`, which is the default for a single worker.
 
         Returns
         -------
@@ -1741,31 +2470,75 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             raise ValueError(
                 "model_list argument is None, not a list, or contains non-string elements for generate_model_reports. Please provide a list of model_id strings to generate reports."
             )
+        model_list = list(dict.fromkeys(model_list))
         working_dir, temp_dir = cdh_utils.create_working_and_temp_dir(name, working_dir)
 
         try:
             qmd_file = "ModelReport.qmd"
-            self._copy_quarto_file(qmd_file, temp_dir)
             self.save_data(temp_dir)
-            output_file_paths = []
-            for i, model_id in enumerate(model_list):
+            if n_workers is None:
+                n_workers = min(4, os.cpu_count() or 1)
+            n_workers = max(1, min(n_workers, len(model_list)))
+            if n_workers > 1:
+                # Concurrent renders would interleave their output
+                kwargs.setdefault("verbose", False)
+            execute_daemon = (
+                self.quarto_daemon_timeout
+                if keep_kernel and len(model_list) > n_workers
+                else None
+            )
+            started_workers = set()
+            worker_dirs = queue.Queue()
+            for i in range(n_workers):
+                worker_dir = temp_dir / f"worker_{i}"
+                worker_dir.mkdir()
+                self._copy_quarto_file(qmd_file, worker_dir)
+                worker_dirs.put(worker_dir)
+
+            def render(model_id: str) -> Path:
                 output_filename = self._get_output_filename(
                     name, "ModelReport", model_id, output_type
                 )
-                self._write_params_file(temp_dir, model_id, only_active_predictors)
-                self._run_quarto_command(
-                    temp_dir,
-                    qmd_file,
-                    output_type,
-                    output_filename,
-                    **kwargs,
-                )
-                output_path = temp_dir / output_filename
-                if not output_path.exists():
-                    raise ValueError(f"Failed to write the report: {output_filename}")
-                output_file_paths.append(output_path)
-                if progress_callback:
-                    progress_callback(i + 1, len(model_list))
+                worker_dir = worker_dirs.get()
+                try:
+                    self._write_params_file(
+                        worker_dir, model_id, only_active_predictors, temp_dir
+                    )
+                    self._run_quarto_command(
+                        worker_dir,
+                        qmd_file,
+                        output_type,
+                        output_filename,
+                        execute_daemon=execute_daemon,
+                        # Start every worker with a fresh kernel
+                        execute_daemon_restart=worker_dir not in started_workers,
+                        **kwargs,
+                    )
+                    started_workers.add(worker_dir)
+                    if not (worker_dir / output_filename).exists():
+                        raise ValueError(
+                            f"Failed to write the report: {output_filename}"
+                        )
+                    os.replace(
+                        worker_dir / output_filename, temp_dir / output_filename
+                    )
+                    return temp_dir / output_filename
+                finally:
+                    worker_dirs.put(worker_dir)
+
+            with ThreadPoolExecutor(n_workers) as pool:
+                futures = [pool.submit(render, model_id) for model_id in model_list]
+                try:
+                    for i, future in enumerate(as_completed(futures)):
+                        future.result()
+                        if progress_callback:
+                            progress_callback(i + 1, len(model_list))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            output_file_paths = [future.result() for future in futures]
+            output_path = output_file_paths[-1]
             base_file_name = kwargs.get(
                 base_file_name, output_path
             )  # either use the given name or the latest file name
@@ -1776,7 +2549,7 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             with open(output_path, "wb") as f:
                 f.write(file_data)
             if not output_path.exists():
-                raise ValueError(f"Failed to generate report: {output_filename}")
+                raise ValueError(f"Failed to generate report: {file_name}")
 
             return output_path
 
@@ -1836,7 +2609,10 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
 
             self._copy_quarto_file(qmd_file, temp_dir)
             self.save_data(temp_dir)
-            self._write_params_file(temp_dir, None, None)
+            health_check_data = self.save_health_check_data(temp_dir)
+            self._write_params_file(
+                temp_dir, None, None, health_check_data=health_check_data
+            )
             self._run_quarto_command(
                 temp_dir,
                 qmd_file,
@@ -1893,8 +2669,20 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
         if not predictordata_files:
             logger.warning("No cached predictor data found.")
 
-    def _write_params_file(self, temp_dir, model_id, only_active_predictors):
-        """Write parameters to a YAML file."""
+    def _write_params_file(
+        self,
+        temp_dir,
+        model_id,
+        only_active_predictors,
+        data_dir=None,
+        health_check_data=None,
+    ):
+        """Write parameters to a YAML file.
+
+        If `data_dir` is given, the report reads the cached data from there,
+        instead of from its own directory. If `health_check_data` is given, the
+        Health Check reads its precomputed aggregates from that directory.
+        """
         params = {
             "kwargs": {
                 "subset": False,
@@ -1902,6 +2690,10 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
                 "only_active_predictors": only_active_predictors,
             },
         }
+        if data_dir is not None:
+            params["kwargs"]["path"] = str(Path(data_dir).resolve())
+        if health_check_data is not None:
+            params["health_check_data_dir"] = str(Path(health_check_data).resolve())
         with open(temp_dir / "params.yaml", "w") as f:
             yaml.dump(params, f)
 
@@ -1911,9 +2703,17 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
         qmd_file: str,
         output_type: str,
         output_filename: str,
+        execute_daemon: Optional[int] = None,
+        execute_daemon_restart: bool = False,
         **kwargs,
     ) -> int:
-        """Run the Quarto command to generate the report."""
+        """Run the Quarto command to generate the report.
+
+        If `execute_daemon` is given, Quarto keeps the Jupyter kernel alive for
+        that many seconds, so subsequent renders of the same file reuse it.
+        With `execute_daemon_restart`, a kernel that is still alive is replaced
+        by a fresh one first.
+        """
         verbose = kwargs.get("verbose", True)
         if verbose:
             print("Set verbose=False to hide output.")
@@ -1950,6 +2750,10 @@ Meaning in total, {self.model_stats['models_n_nonperforming']} ({round(self.mode
             "--execute-params",
             "params.yaml",
         ]
+        if execute_daemon is not None:
+            command += ["--execute-daemon", str(execute_daemon)]
+            if execute_daemon_restart:
+                command.append("--execute-daemon-restart")
 
         process = subprocess.Popen(
             command,
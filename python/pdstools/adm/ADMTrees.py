@@ -1,29 +1,35 @@
 import base64
 import collections
 import functools
+import hashlib
 from functools import cached_property, lru_cache
 import json
 import logging
 import multiprocessing
-import operator
+import os
 import urllib.request
+import warnings
+import weakref
 import zlib
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from math import exp
-from statistics import mean
 from typing import Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import polars as pl
 import plotly.express as px
 import plotly.graph_objects as go
 import pydot
 from plotly.subplots import make_subplots
-from tqdm import tqdm
 import copy
 
+from ..pega_io.File import readHDSChunks
+from ..utils import cdh_utils
+
 
 class ADMTrees:
-    def __new__(cls, file, n_threads=6, verbose=True, **kwargs):
+    def __new__(cls, file, n_threads=None, verbose=True, **kwargs):
         if isinstance(file, pl.DataFrame):
             logging.info("DataFrame supplied.")
             file = file.filter(pl.col("Modeldata").is_not_null())
@@ -33,9 +39,7 @@ class ADMTrees:
                     print(
                         f"AGB models found: {file.select(pl.col('Configuration').unique())}"
                     )
-                return cls.getMultiTrees(
-                    file=file, n_threads=n_threads, verbose=verbose, **kwargs
-                )
+                return cls.getMultiTrees(file=file, n_threads=n_threads, **kwargs)
             else:
                 logging.info("One model found, so creating ADMTrees")
                 return ADMTrees(file.select("Modeldata").item(), **kwargs)
@@ -48,38 +52,34 @@ class ADMTrees:
         return ADMTreesModel(file, **kwargs)
 
     @staticmethod
-    def getMultiTrees(file: pl.DataFrame, n_threads=1, verbose=True, **kwargs):
-        out = {}
+    def getMultiTrees(
+        file: pl.DataFrame, n_threads=None, verbose=None, cache_size: int = 8, **kwargs
+    ):
+        """Groups the models in a datamart table into MultiTrees per configuration.
+
+        Only the compressed model data is kept: each snapshot is decoded
+        when it is accessed, see :class:`MultiTrees`. The `n_threads` and
+        `verbose` arguments are deprecated, as nothing is decoded up front.
+        """
+        if n_threads is not None or verbose is not None:
+            warnings.warn(
+                "The n_threads and verbose arguments of getMultiTrees are no "
+                "longer used, as the snapshots are only decoded when accessed.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
         df = file.filter(pl.col("Modeldata").is_not_null()).select(
-            pl.col("SnapshotTime")
-            .dt.round("1s")
-            .cast(pl.Utf8)
-            .str.strip_chars_end(".000000000"),
+            pl.col("SnapshotTime").dt.round("1s").dt.strftime("%Y-%m-%d %H:%M:%S"),
             pl.col("Modeldata").str.decode("base64"),
             pl.col("Configuration").cast(pl.Utf8),
         )
-        if len(df) > 50 and n_threads == 1 and verbose:
-            print(
-                f"""Decoding {len(df)} models, 
-            setting n_threads to a higher value may speed up processing time."""
-            )
-        df2 = df.select(
-            pl.concat_list(["Configuration", "SnapshotTime"]), "Modeldata"
-        ).to_dict()
-
-        with multiprocessing.Pool(n_threads) as p:
-            f = map if n_threads < 2 else p.imap
-            out = dict(
-                zip(
-                    map(tuple, df2["Configuration"].to_list()),
-                    list(f(ADMTrees, tqdm(df2["Modeldata"]))),
-                )
-            )
-        dictPerConfig = {key[0]: {} for key in out.keys()}
-        for (configuration, timestamp), value in out.items():
-            dictPerConfig[configuration][timestamp] = value
+        dictPerConfig = {}
+        for configuration, timestamp, blob in df.select(
+            "Configuration", "SnapshotTime", "Modeldata"
+        ).iter_rows():
+            dictPerConfig.setdefault(configuration, {})[timestamp] = blob
         return {
-            key: MultiTrees(value, model_name=key)
+            key: MultiTrees(value, model_name=key, cache_size=cache_size)
             for key, value in dictPerConfig.items()
         }
 
@@ -107,12 +107,15 @@ class ADMTreesModel:
     learning_rate: float
     model: Dict
     treeStats: Dict
+    nodeTable: pl.DataFrame
     splitsPerTree: Dict
     gainsPerTree: Dict
     gainsPerSplit: pl.DataFrame
     groupedGainsPerSplit: Dict
     predictors: Set
     allValuesPerSplit: Dict
+    compiledTrees: CompiledTrees
+    encoders: Dict
 
     Notes
     -----
@@ -121,14 +124,118 @@ class ADMTreesModel:
     also contains this information, but it is compressed and
     the values for each split is encoded. Using the 'save model'
     button, only that data is decompressed and decoded.
+
+    A decoded model can be saved with :meth:`save`, and read back
+    with :meth:`load` without decompressing or decoding it again.
     """
 
+    _FORMAT_VERSION = 1
+
     def __init__(self, file: str, **kwargs):
         logging.info("Reading model...")
         self._read_model(file, **kwargs)
         if self.trees is None:
             raise ValueError("Import unsuccessful.")
 
+    @property
+    def model(self) -> List[Dict]:
+        """The (decoded) trees of the model.
+
+        For a model read with :meth:`load`, the trees are only read from
+        disk when first accessed, see :meth:`_loadTrees`.
+        """
+        if "_model" not in self.__dict__:
+            self._loadTrees()
+        return self._model
+
+    @model.setter
+    def model(self, trees: List[Dict]):
+        self._model = trees
+
+    def _loadTrees(self):
+        """Reads the trees of a model that was read with :meth:`load`."""
+        treesFile = self.__dict__.get("_treesFile")
+        if treesFile is None:
+            raise AttributeError("The model has no trees yet")
+        with open(treesFile) as f:
+            self._model = json.load(f)
+        del self._treesFile
+
+    def save(self, path: str):
+        """Saves the decoded model to a directory, in a binary format.
+
+        The directory holds the arrays of :attr:`compiledTrees` as
+        ``.npy`` files, the decoded trees as json and the properties
+        and decoded encoders of the model, so :meth:`load` does not
+        need to decompress, parse or decode the original model again.
+
+        Parameters
+        ----------
+        path: str
+            The directory to write to; created if it does not exist
+        """
+        os.makedirs(path, exist_ok=True)
+        self.compiledTrees.save(path)
+        with open(os.path.join(path, "trees.json"), "w") as f:
+            json.dump(self.model, f)
+        metadata = {
+            "version": self._FORMAT_VERSION,
+            "properties": getattr(self, "properties", {}),
+            "learning_rate": getattr(self, "learning_rate", None),
+            "context_keys": self.context_keys,
+            "encoders": {
+                str(index): {
+                    key: value.tolist() if isinstance(value, np.ndarray) else value
+                    for key, value in table.items()
+                }
+                for index, table in self.encoders.items()
+            },
+        }
+        with open(os.path.join(path, "model.json"), "w") as f:
+            json.dump(metadata, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ADMTreesModel":
+        """Loads a model written by :meth:`save`.
+
+        The compiled trees are available immediately (and memory-mapped
+        if `mmap` is True), so the model can score without any decoding.
+        The nested trees are only read when first accessed.
+
+        Parameters
+        ----------
+        path: str
+            The directory the model was saved to
+        mmap: bool, default = True
+            Whether to memory-map the arrays of the compiled trees
+            rather than reading them into memory
+        """
+        with open(os.path.join(path, "model.json")) as f:
+            metadata = json.load(f)
+        if metadata.get("version") != cls._FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported model format version: {metadata.get('version')}"
+            )
+
+        model = cls.__new__(cls)
+        # The original export is not saved, only what was derived from it
+        model.trees = None
+        model.raw_model = None
+        model.properties = metadata["properties"]
+        if metadata["learning_rate"] is not None:
+            model.learning_rate = metadata["learning_rate"]
+        model.context_keys = metadata["context_keys"]
+        model.encoders = {
+            int(index): {
+                key: np.array(value) if key == "indices" else value
+                for key, value in table.items()
+            }
+            for index, table in metadata["encoders"].items()
+        }
+        model.compiledTrees = CompiledTrees.load(path, mmap=mmap)
+        model._treesFile = os.path.join(path, "trees.json")
+        return model
+
     def _read_model(self, file, **kwargs):
         def _import(file):
             logging.info("Trying regular import.")
@@ -194,88 +301,145 @@ class ADMTreesModel:
 
         self._post_import_cleanup(decode=decode, **kwargs)
 
-    def _decodeTrees(self):
-        def quantileDecoder(encoder: dict, index: int, verbose=False):
-            if encoder["summaryType"] == "INITIAL_SUMMARY":
-                return encoder["summary"]["initialValues"][
-                    index
-                ]  # Note: could also be index-1
-            return encoder["summary"]["list"][index - 1].split("=")[0]
-
-        def stringDecoder(encoder: dict, index: int, sign, verbose=False):
-            def set_types(split):
-                logging.debug(split)
-                split = split.rsplit("=", 1)
-                split[1] = int(split[1])
-                return tuple(reversed(split))
-
-            valuelist = collections.OrderedDict(
-                sorted([set_types(i) for i in encoder["symbols"]])
-            )
-            splitvalues = list()
-            for key, value in valuelist.items():
-                if verbose:
-                    print(key, value, index)
-                if int(key) == index - 129 and index == 129 and sign == "<":
-                    splitvalues.append("Missing")
-                    break
-                elif eval(f"{int(key)}{sign}{index-129}"):
-                    splitvalues.append(value)
-                else:
-                    pass
-            output = ", ".join(splitvalues)
-            return output
-
-        def decodeSplit(split: str, verbose=False):
-            if not isinstance(split, str):
-                return split
-            logging.debug(f"Decoding split: {split}")
-            predictor, sign, splitval = split.split(" ")
-
-            if sign == "LT":
-                sign = "<"
-            elif sign == "EQ":
-                sign = "=="
-            else:
-                print("For now, only supporting less than and equality splits")
-                raise ValueError((predictor, sign, splitval))
-            variable = encoderkeys[int(predictor)]
-            encoder = encoders[variable]
-            variableType = list(encoder["encoder"].keys())[0]
-            to_decode = list(encoder["encoder"].values())[0]
-            if variableType == "quantileArray":
-                val = quantileDecoder(to_decode, int(splitval))
-            if variableType == "stringTranslator":
-                val = stringDecoder(
-                    to_decode, int(splitval), sign=sign, verbose=verbose
-                )
-                if val == "Missing":
-                    sign, val = "is", "Missing"
-                else:
-                    val = "{ " + val + " }"
-                    sign = "in"
-            logging.debug(f"Decoded split: {variable} {sign} {val}")
-            return f"{variable} {sign} {val}"
+    def _getDecodeTables(self) -> Dict[int, Dict]:
+        """Builds a lookup table per encoder to decode the splits with.
 
+        For string encoders, the table holds the sorted symbol indices
+        with their symbols; for quantile encoders, the split boundaries.
+        These are built once per model, rather than once per split.
+        """
         try:
             encoders = self.trees["model"]["model"]["inputsEncoder"]["encoders"]
         except:
             encoders = self.trees["model"]["inputsEncoder"]["encoders"]
-        encoderkeys = collections.OrderedDict()
+
+        tables = {}
         for encoder in encoders:
-            encoderkeys[encoder["value"]["index"]] = encoder["key"]
-        encoders = {encoder["key"]: encoder["value"] for encoder in encoders}
+            variableType, to_decode = list(encoder["value"]["encoder"].items())[0]
+            table = {"variable": encoder["key"], "type": variableType}
+            if variableType == "quantileArray":
+                if to_decode["summaryType"] == "INITIAL_SUMMARY":
+                    # Note: could also be index-1
+                    table["values"] = to_decode["summary"]["initialValues"]
+                    table["offset"] = 0
+                else:
+                    table["values"] = [
+                        value.split("=")[0] for value in to_decode["summary"]["list"]
+                    ]
+                    table["offset"] = -1
+            elif variableType == "stringTranslator":
+                symbols = dict(
+                    sorted(
+                        (int(index), symbol)
+                        for symbol, index in (
+                            value.rsplit("=", 1) for value in to_decode["symbols"]
+                        )
+                    )
+                )
+                table["indices"] = np.fromiter(symbols.keys(), dtype=np.int64)
+                table["symbols"] = list(symbols.values())
+            tables[encoder["value"]["index"]] = table
+        return tables
+
+    @cached_property
+    def encoders(self) -> Dict[int, Dict]:
+        """The decode tables of the input encoders, empty if not encoded."""
+        try:
+            return self._getDecodeTables()
+        except (KeyError, TypeError):
+            return {}
+
+    def _decodeTrees(self):
+        """Decodes the splits of all trees.
+
+        All distinct splits are parsed in one go, and decoded per encoder
+        with a vectorized lookup into the tables of :meth:`_getDecodeTables`.
+        """
+        signs = {"LT": "<", "EQ": "=="}
+
+        def collectSplits(tree, splits):
+            if isinstance(tree.get("split"), str):
+                splits.add(tree["split"])
+            for child in ("left", "right"):
+                if child in tree:
+                    collectSplits(tree[child], splits)
+            return splits
+
+        splits = set()
+        for tree in self.model:
+            collectSplits(tree, splits)
+        if len(splits) == 0:
+            return
+        splits = pl.DataFrame({"split": list(splits)}).with_columns(
+            pl.col("split")
+            .str.split_exact(" ", 2)
+            .struct.rename_fields(["predictor", "sign", "splitval"])
+            .alias("parsed")
+        ).unnest("parsed")
+        unsupported = splits.filter(
+            ~pl.col("sign").is_in(list(signs.keys())).fill_null(False)
+        )
+        if len(unsupported) > 0:
+            print("For now, only supporting less than and equality splits")
+            raise ValueError(unsupported.row(0))
+        splits = splits.with_columns(pl.col("predictor", "splitval").cast(pl.Int64))
+
+        decoded = {}
+        tables = self.encoders
+        for (predictor,), group in splits.group_by("predictor"):
+            table = tables[predictor]
+            variable = table["variable"]
+            indices = group.get_column("splitval").to_numpy()
+            for split, sign, index, value in zip(
+                group.get_column("split"),
+                group.get_column("sign").replace(signs),
+                indices,
+                self._decodeValues(table, group.get_column("sign"), indices),
+            ):
+                if table["type"] == "stringTranslator":
+                    if value is None:
+                        sign, value = "is", "Missing"
+                    else:
+                        sign, value = "in", "{ " + value + " }"
+                decoded[split] = f"{variable} {sign} {value}"
 
-        def decodeAllTrees(ob, func):
+        def decodeAllTrees(ob):
             if isinstance(ob, collections.abc.Mapping):
-                return {k: decodeAllTrees(v, func) for k, v in ob.items()}
-            else:
-                return func(ob)
+                return {k: decodeAllTrees(v) for k, v in ob.items()}
+            elif isinstance(ob, str):
+                return decoded[ob]
+            return ob
 
         for i, model in enumerate(self.model):
-            self.model[i] = decodeAllTrees(model, decodeSplit)
+            self.model[i] = decodeAllTrees(model)
             logging.debug(f"Decoded tree {i}")
 
+    @staticmethod
+    def _decodeValues(table: Dict, signs: pl.Series, indices: np.ndarray) -> List:
+        """Decodes the split values of one encoder at once.
+
+        For string encoders, a 'less than' split selects all symbols
+        with an index below the split index (minus 129), and an 'equals'
+        split the symbols with exactly that index. The first split on a
+        symbol with index 0 is the split on missing values, returned as None.
+        """
+        if table["type"] == "quantileArray":
+            values = table["values"]
+            return [values[index + table["offset"]] for index in indices]
+
+        symbols, symbolIndices = table["symbols"], table["indices"]
+        indices = indices - 129
+        lower = np.searchsorted(symbolIndices, indices, side="left")
+        upper = np.searchsorted(symbolIndices, indices, side="right")
+        lessThan = (signs == "LT").to_numpy()
+        missing = lessThan & (indices == 0) & (symbolIndices == 0).any()
+        start = np.where(lessThan, 0, lower)
+        end = np.where(lessThan, lower, upper)
+        return [
+            None if isMissing else ", ".join(symbols[s:e])
+            for isMissing, s, e in zip(missing, start, end)
+        ]
+
     def _post_import_cleanup(self, decode, **kwargs):
         if not hasattr(self, "model"):
             logging.info("Adding model tag")
@@ -320,17 +484,16 @@ class ADMTreesModel:
             logging.info("Could not find context keys.")
             self.context_keys = kwargs.get("context_keys", None)
 
-    def _depth(self, d: Dict) -> Dict:
-        """Calculates the depth of the tree, used in TreeStats."""
-        if isinstance(d, dict):
-            return 1 + (max(map(self._depth, d.values())) if d else 0)
-        return 0
-
     @cached_property
     def predictors(self):
         logging.info("Extracting predictors.")
         return self.getPredictors()
 
+    @cached_property
+    def nodeTable(self):
+        logging.info("Flattening the trees.")
+        return self.getNodeTable()
+
     @cached_property
     def treeStats(self):
         logging.info("Calculating tree stats.")
@@ -454,32 +617,98 @@ class ADMTreesModel:
             predictorsDict[predictor["name"]] = predictor["type"]
         return predictorsDict
 
-    @lru_cache
-    def getGainsPerSplit(self) -> Tuple[Dict, pl.DataFrame, dict]:
-        """Function to compute the gains of each split in each tree."""
-        self.predictors
+    def getNodeTable(self) -> pl.DataFrame:
+        """Flattens all trees into one table, with a row per node.
 
-        splitsPerTree = {
-            treeID: self.getSplitsRecursively(tree=tree, splits=[], gains=[])[0]
-            for treeID, tree in enumerate(self.model)
-        }
-        gainsPerTree = {
-            treeID: self.getSplitsRecursively(tree=tree, splits=[], gains=[])[1]
-            for treeID, tree in enumerate(self.model)
+        Nodes are numbered in pre-order within each tree, starting at 1
+        for the root, as in :meth:`getTreeRepresentation`. Each distinct
+        split is parsed only once, so the tree statistics can be derived
+        from this table with group-bys rather than by walking the trees.
+
+        Returns
+        -------
+        pl.DataFrame
+            With columns tree_id, node_id, parent (null for the root),
+            depth (0 for the root), split, predictor, sign, value
+            (the split values as a list), gain and score. The split
+            columns are null for leaves.
+        """
+        schema = {
+            "tree_id": pl.Int64,
+            "node_id": pl.Int64,
+            "parent": pl.Int64,
+            "depth": pl.Int64,
+            "split": pl.Utf8,
+            "gain": pl.Float64,
+            "score": pl.Float64,
         }
-        splitlist = [value for value in splitsPerTree.values() if value != []]
-        gainslist = [value for value in gainsPerTree.values() if value != []]
-        total_split_list = functools.reduce(operator.iconcat, splitlist, [])
-        total_gains_list = functools.reduce(operator.iconcat, gainslist, [])
-        gainsPerSplit = pl.DataFrame(
-            list(zip(total_split_list, total_gains_list)),
-            schema=["split", "gains"],
-            orient="row",
+        columns = {key: [] for key in schema}
+        for treeID, tree in enumerate(self.model):
+            nodeID = 0
+            stack = [(tree, None, 0)]
+            while stack:
+                node, parent, depth = stack.pop()
+                nodeID += 1
+                columns["tree_id"].append(treeID)
+                columns["node_id"].append(nodeID)
+                columns["parent"].append(parent)
+                columns["depth"].append(depth)
+                columns["split"].append(node.get("split"))
+                columns["gain"].append(node.get("gain", 0.0))
+                columns["score"].append(node.get("score", 0.0))
+                if "left" in node:
+                    # Pushed in reverse so the left subtree is numbered first
+                    stack.append((node["right"], nodeID, depth + 1))
+                    stack.append((node["left"], nodeID, depth + 1))
+
+        nodes = pl.DataFrame(columns, schema=schema, strict=False)
+        splits = nodes.get_column("split").drop_nulls().unique(maintain_order=True)
+        parsed = [self.parseSplitValues(split) for split in splits]
+        splits = pl.DataFrame(
+            {
+                "split": splits,
+                "predictor": [variable for variable, _, _ in parsed],
+                "sign": [sign for _, sign, _ in parsed],
+                "value": [sorted(values) for _, _, values in parsed],
+            },
+            schema={
+                "split": pl.Utf8,
+                "predictor": pl.Utf8,
+                "sign": pl.Utf8,
+                "value": pl.List(pl.Utf8),
+            },
         )
-        gainsPerSplit = gainsPerSplit.with_columns(
-            predictor=pl.col("split").map_elements(
-                lambda x: self.parseSplitValues(x)[0]
+        return nodes.join(splits, on="split", how="left").select(
+            "tree_id",
+            "node_id",
+            "parent",
+            "depth",
+            "split",
+            "predictor",
+            "sign",
+            "value",
+            "gain",
+            "score",
+        )
+
+    @lru_cache
+    def getGainsPerSplit(self) -> Tuple[Dict, pl.DataFrame, dict]:
+        """Function to compute the gains of each split in each tree."""
+        isSplit = pl.col("split").is_not_null()
+        splits = self.nodeTable.filter(isSplit)
+        perTree = (
+            self.nodeTable.group_by("tree_id", maintain_order=True)
+            .agg(
+                pl.col("split").drop_nulls(),
+                pl.col("gain").filter(isSplit & (pl.col("gain") > 0)),
             )
+            .sort("tree_id")
+        )
+        treeIDs = perTree.get_column("tree_id").to_list()
+        splitsPerTree = dict(zip(treeIDs, perTree.get_column("split").to_list()))
+        gainsPerTree = dict(zip(treeIDs, perTree.get_column("gain").to_list()))
+        gainsPerSplit = splits.filter(pl.col("gain") > 0).select(
+            "split", gains="gain", predictor="predictor"
         )
         return splitsPerTree, gainsPerTree, gainsPerSplit
 
@@ -490,55 +719,24 @@ class ADMTreesModel:
         the mean gains, and the number of times the split is performed.
         """
         return (
-            self.gainsPerSplit.group_by("split", maintain_order=True)
+            self.gainsPerSplit.join(
+                self.nodeTable.select("split", "sign", "value").unique(
+                    "split", maintain_order=True
+                ),
+                on="split",
+                how="left",
+            )
+            .group_by("split", maintain_order=True)
             .agg(
-                [
-                    pl.first("predictor"),
-                    pl.col("gains").implode(),
-                    pl.col("gains").mean().alias("mean"),
-                    pl.first("split")
-                    .map_elements(lambda x: self.parseSplitValues(x)[1])
-                    .alias("sign"),
-                    pl.first("split")
-                    .map_elements(lambda x: self.parseSplitValues(x)[2])
-                    .alias("values"),
-                ]
+                pl.first("predictor"),
+                pl.col("gains"),
+                pl.col("gains").mean().alias("mean"),
+                pl.first("sign"),
+                pl.first("value").alias("values"),
             )
             .with_columns(n=pl.col("gains").list.len())
         )
 
-    def getSplitsRecursively(
-        self, tree: Dict, splits: List, gains: List
-    ) -> Tuple[List, List]:
-        """Recursively finds splits and their gains for each node.
-
-        By Python's mutatable list mechanic, the easiest way to achieve
-        this is to explicitly supply the function with empty lists.
-        Therefore, the 'splits' and 'gains' parameter expect
-        empty lists when initially called.
-
-        Parameters
-        ----------
-        tree: Dict
-        splits: List
-        gains: List
-
-        Returns
-        -------
-            Tuple[List, List]
-            Each split, and its corresponding gain
-
-        """
-        for key, value in tree.items():
-            if key == "gain":
-                if value > 0:
-                    gains.append(value)
-            if key == "split":
-                splits.append(value)
-            if key in {"left", "right"}:
-                self.getSplitsRecursively(tree=dict(value), splits=splits, gains=gains)
-        return splits, gains
-
     def plotSplitsPerVariable(self, subset: Optional[Set] = None, show=True):
         """Plots the splits for each variable in the tree.
 
@@ -601,34 +799,35 @@ class ADMTreesModel:
 
     def getTreeStats(self) -> pl.DataFrame:
         """Generate a dataframe with useful stats for each tree"""
-        stats = {
-            k: [] for k in ["treeID", "score", "depth", "nsplits", "gains", "meangains"]
-        }
-        for treeID, tree in enumerate(self.model):
-            stats["treeID"].append(treeID)
-            stats["score"].append(tree["score"])
-            stats["depth"].append(self._depth(tree) - 1)
-            splits, gains = self.getSplitsRecursively(tree, splits=[], gains=[])
-            stats["nsplits"].append(len(splits))
-            stats["gains"].append(gains)
-            meangains = mean(gains) if len(gains) > 0 else 0
-            stats["meangains"].append(meangains)
-
-        return pl.from_dict(stats)
+        isSplit = pl.col("split").is_not_null()
+        return (
+            self.nodeTable.group_by("tree_id", maintain_order=True)
+            .agg(
+                pl.col("score").first(),
+                pl.col("depth").max(),
+                isSplit.sum().cast(pl.Int64).alias("nsplits"),
+                pl.col("gain").filter(isSplit & (pl.col("gain") > 0)).alias("gains"),
+            )
+            .sort("tree_id")
+            .with_columns(meangains=pl.col("gains").list.mean().fill_null(0))
+            .rename({"tree_id": "treeID"})
+        )
 
     def getAllValuesPerSplit(self) -> Dict:
         """Generate a dictionary with the possible values for each split"""
-        splitvalues = {}
-        for (name,), group in self.groupedGainsPerSplit.group_by("predictor"):
-            if name not in splitvalues.keys():
-                splitvalues[name] = set()
-            splitvalue = group.get_column("values").to_list()
-            try:
-                for i in splitvalue:
-                    splitvalues[name] = splitvalues[name].union(i)
-            except Exception as e:
-                print(e)
-        return splitvalues
+        values = (
+            self.nodeTable.filter(pl.col("split").is_not_null())
+            .unique("split", maintain_order=True)
+            .select("predictor", "value")
+            .explode("value")
+            .unique(maintain_order=True)
+            .group_by("predictor", maintain_order=True)
+            .agg("value")
+        )
+        return {
+            predictor: set(predictorValues)
+            for predictor, predictorValues in values.iter_rows()
+        }
 
     def getNodesRecursively(
         self, tree: Dict, nodelist: Dict, counter: Dict, childs: List
@@ -880,6 +1079,216 @@ class ADMTreesModel:
         score = self.getAllVisitedNodes(x)["score"].sum()
         return 1 / (1 + exp(-score))
 
+    @cached_property
+    def compiledTrees(self) -> "CompiledTrees":
+        logging.info("Compiling trees.")
+        return CompiledTrees.from_model(self)
+
+    def score_batch(
+        self, df: Union[pl.DataFrame, pl.LazyFrame], chunk_size: int = 100_000
+    ) -> pl.Series:
+        """Computes the score for every row of a dataframe.
+
+        Equivalent to calling :meth:`score` on each row, but uses the
+        array representation in :attr:`compiledTrees` to traverse all trees
+        for a whole chunk of rows at once.
+
+        Parameters
+        ----------
+        df: Union[pl.DataFrame, pl.LazyFrame]
+            The data to score, with one column per predictor
+        chunk_size: int, default = 100_000
+            The number of rows to traverse at once, bounding memory usage
+
+        Returns
+        -------
+        pl.Series
+            The propensity for each row, in the order of the input
+        """
+        return self.compiledTrees.score_batch(df, chunk_size=chunk_size)
+
+    def explain_batch(
+        self, df: Union[pl.DataFrame, pl.LazyFrame], chunk_size: int = 100_000
+    ) -> Tuple[pl.DataFrame, pl.DataFrame]:
+        """Explains the score of every row of a dataframe.
+
+        The score of a leaf equals the score of the root of its tree plus
+        the change in score at every split on the path to the leaf. Those
+        changes are attributed to the predictor of the split, which splits
+        the log-odds of every row exactly into a bias (the summed root
+        scores) and a contribution per predictor.
+
+        Parameters
+        ----------
+        df: Union[pl.DataFrame, pl.LazyFrame]
+            The data to explain, with one column per predictor
+        chunk_size: int, default = 100_000
+            The number of rows to traverse at once, bounding memory usage
+
+        Returns
+        -------
+        Tuple[pl.DataFrame, pl.DataFrame]
+            The score of the leaf reached in each tree, with a column per
+            tree (named by the tree number), and the contributions, with
+            a 'Bias' column and a column per predictor used in the splits.
+            Both sum per row to the log-odds of :meth:`score_batch`.
+        """
+        compiled = self.compiledTrees
+        leaves = compiled.leaves(df, chunk_size=chunk_size)
+        leafScores = pl.DataFrame(
+            compiled.score[leaves],
+            schema=[str(treeID) for treeID in range(len(compiled))],
+            orient="row",
+        )
+        contributions = pl.DataFrame(
+            compiled.contributions(leaves),
+            schema=compiled.predictors,
+            orient="row",
+        ).select(
+            pl.lit(compiled.score[compiled.roots].sum()).alias("Bias"),
+            pl.all(),
+        )
+        return leafScores, contributions
+
+    def evaluate_hds(
+        self,
+        files: Union[str, List[str]],
+        outcome_column: str = "Decision_Outcome",
+        positive_outcomes: Optional[List[str]] = None,
+        negative_outcomes: Optional[List[str]] = None,
+        chunk_size: int = 100_000,
+        n_workers: Optional[int] = None,
+        n_bins: int = 1000,
+        n_calibration_bins: int = 10,
+    ) -> Dict:
+        """Evaluates the model offline, on a Historical Dataset (HDS) export.
+
+        The export is read in chunks, and the chunks are scored on a pool
+        of worker processes. Each worker only returns the counts of
+        positives and negatives per propensity bin, which are summed as
+        the results come in, so memory use does not grow with the size
+        of the export.
+
+        The HDS columns are matched to the predictors by name, with the
+        dots in the predictor names replaced by underscores, and context
+        keys such as 'pyName' matched to 'Context_Name'. Predictors not
+        in the export are treated as missing.
+
+        Parameters
+        ----------
+        files: Union[str, List[str]]
+            The HDS export(s), as multi-line json or zip files
+        outcome_column: str, default = "Decision_Outcome"
+            The column with the outcome of each decision
+        positive_outcomes: List[str], optional
+            The outcomes that count as positive responses,
+            defaults to ["Accepted", "Clicked"]
+        negative_outcomes: List[str], optional
+            The outcomes that count as negative responses,
+            defaults to ["Rejected", "Impression"].
+            Records with other outcomes are ignored.
+        chunk_size: int, default = 100_000
+            The number of records to score at once
+        n_workers: int, optional
+            The number of worker processes, defaults to the number of CPUs.
+            With 1 worker, all chunks are scored in the current process.
+        n_bins: int, default = 1000
+            The number of equal-width propensity bins to count the
+            responses in. The AUC is computed from these bins, so this
+            determines its precision.
+        n_calibration_bins: int, default = 10
+            The number of propensity bins in the calibration table
+
+        Returns
+        -------
+        Dict
+            With the AUC, the AUC-PR (see
+            :func:`cdh_utils.auc_from_bincounts` and
+            :func:`cdh_utils.aucpr_from_bincounts`), the number of
+            responses and positives, and the calibration table with the
+            mean propensity and observed success rate per bin
+        """
+        if positive_outcomes is None:
+            positive_outcomes = ["Accepted", "Clicked"]
+        if negative_outcomes is None:
+            negative_outcomes = ["Rejected", "Impression"]
+        compiled = self.compiledTrees
+        options = dict(
+            outcome_column=outcome_column,
+            positive_outcomes=list(positive_outcomes),
+            negative_outcomes=list(negative_outcomes),
+            n_bins=n_bins,
+        )
+        counts = np.zeros((3, n_bins))
+        chunks = readHDSChunks(files, chunk_size=chunk_size)
+        if n_workers == 1:
+            for chunk in chunks:
+                counts += _evaluateChunk(chunk, compiled=compiled, **options)
+        else:
+            n_workers = n_workers or os.cpu_count()
+            # Forking a process that already runs Polars threads can deadlock
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initEvaluationWorker,
+                initargs=(compiled,),
+            ) as pool:
+                # Bound the number of chunks in flight, to bound memory
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_evaluateChunk, chunk, **options))
+                    if len(pending) >= 2 * n_workers:
+                        counts += pending.popleft().result()
+                while pending:
+                    counts += pending.popleft().result()
+
+        pos, neg, propensities = counts
+        nonEmpty = (pos + neg) > 0
+        pos, neg, propensities = pos[nonEmpty], neg[nonEmpty], propensities[nonEmpty]
+        meanPropensity = propensities / (pos + neg)
+        if pos.sum() == 0 or neg.sum() == 0:
+            auc, aucpr = 0.5, 0.0
+        else:
+            auc = cdh_utils.auc_from_bincounts(pos, neg, meanPropensity)
+            aucpr = cdh_utils.aucpr_from_bincounts(pos, neg, meanPropensity)
+
+        calibration = (
+            pl.DataFrame(
+                {
+                    "Bin": np.minimum(
+                        (np.flatnonzero(nonEmpty) * n_calibration_bins) // n_bins,
+                        n_calibration_bins - 1,
+                    ),
+                    "Positives": pos,
+                    "Negatives": neg,
+                    "Propensity": propensities,
+                }
+            )
+            .group_by("Bin")
+            .agg(pl.all().sum())
+            .sort("Bin")
+            .select(
+                "Bin",
+                (pl.col("Bin") / n_calibration_bins).alias("BinLowerBound"),
+                ((pl.col("Bin") + 1) / n_calibration_bins).alias("BinUpperBound"),
+                (pl.col("Positives") + pl.col("Negatives"))
+                .cast(pl.Int64)
+                .alias("ResponseCount"),
+                pl.col("Positives").cast(pl.Int64),
+                (pl.col("Propensity") / (pl.col("Positives") + pl.col("Negatives")))
+                .alias("MeanPropensity"),
+                (pl.col("Positives") / (pl.col("Positives") + pl.col("Negatives")))
+                .alias("SuccessRate"),
+            )
+        )
+        return {
+            "AUC": auc,
+            "AUC_PR": aucpr,
+            "ResponseCount": int(pos.sum() + neg.sum()),
+            "Positives": int(pos.sum()),
+            "Calibration": calibration,
+        }
+
     def plotContributionPerTree(self, x: Dict, show=True):
         """Plots the contribution of each tree towards the final propensity."""
         scores = (
@@ -922,6 +1331,11 @@ class ADMTreesModel:
 
     def predictorCategorization(self, x: str, context_keys=None):
         context_keys = context_keys if context_keys is not None else self.context_keys
+        return self.defaultPredictorCategorization(x, context_keys)
+
+    @staticmethod
+    def defaultPredictorCategorization(x: str, context_keys=None) -> str:
+        """Categorizes a predictor by its prefix, or as a context key."""
         if context_keys is None:
             context_keys = set()
         if len(x.split(".")) > 1:
@@ -1004,11 +1418,585 @@ class ADMTreesModel:
         return fig
 
 
+@dataclass
+class CompiledTrees:
+    """Flat array representation of all trees in an AGB model.
+
+    The nodes of all trees are stored in one set of NumPy arrays,
+    each tree in pre-order (so local node IDs line up with
+    :meth:`ADMTreesModel.getTreeRepresentation`).
+
+    Symbolic splits refer to a symbol set, which is stored as a row in the
+    boolean `membership` matrix over all known symbols. Input values are
+    encoded to symbol codes once per batch, so each split is a lookup.
+
+    Attributes
+    ----------
+    predictors: List[str]
+        The predictor names, indexed by `feature`
+    split_kind: np.ndarray
+        The kind of split per node, see the `LEAF`, `LT`, ... constants
+    feature: np.ndarray
+        Index into `predictors` per node, -1 for leaves
+    threshold: np.ndarray
+        The numeric split value per node, NaN if not a numeric split
+    symbol_set: np.ndarray
+        Index into `membership` per node, -1 if not a symbolic split
+    left: np.ndarray
+        The global index of the left child (taken when the split is true),
+        -1 for leaves
+    right: np.ndarray
+        The global index of the right child, -1 for leaves
+    score: np.ndarray
+        The score of each node
+    gain: np.ndarray
+        The gain of each node
+    roots: np.ndarray
+        The global index of the root node of each tree
+    symbols: Dict[str, int]
+        The code for each known symbol
+    membership: np.ndarray
+        Boolean matrix of shape (symbol sets, symbols + 1), the last
+        column being the code for unknown symbols
+    """
+
+    LEAF = 0
+    LT = 1
+    GT = 2
+    EQ = 3
+    IN = 4
+
+    predictors: List[str]
+    split_kind: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    symbol_set: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    score: np.ndarray
+    gain: np.ndarray
+    roots: np.ndarray
+    symbols: Dict[str, int]
+    membership: np.ndarray
+
+    @classmethod
+    def from_model(cls, model: ADMTreesModel) -> "CompiledTrees":
+        """Compiles the (decoded) trees of an ADMTreesModel."""
+        kinds = {"<": cls.LT, ">": cls.GT, "==": cls.EQ, "in": cls.IN, "is": cls.IN}
+        predictors, symbols, symbol_sets = {}, {}, {}
+        nodes, roots = [], []
+
+        for tree in model.model:
+            roots.append(len(nodes))
+            stack = [(tree, None)]
+            while stack:
+                node, parent = stack.pop()
+                index = len(nodes)
+                if parent is not None:
+                    side = "left" if nodes[parent]["left"] == -1 else "right"
+                    nodes[parent][side] = index
+                entry = {
+                    "kind": cls.LEAF,
+                    "feature": -1,
+                    "threshold": np.nan,
+                    "symbol_set": -1,
+                    "left": -1,
+                    "right": -1,
+                    "score": node.get("score", 0.0),
+                    "gain": node.get("gain", 0.0),
+                }
+                nodes.append(entry)
+                if "left" not in node and "right" not in node:
+                    continue
+
+                variable, sign, values = model.parseSplitValues(node["split"])
+                if sign not in kinds:
+                    raise ValueError(f"Unsupported split: {node['split']}")
+                entry["kind"] = kinds[sign]
+                entry["feature"] = predictors.setdefault(variable, len(predictors))
+                if entry["kind"] == cls.IN:
+                    values = frozenset(v.strip() for v in values)
+                    for value in values:
+                        symbols.setdefault(value, len(symbols))
+                    entry["symbol_set"] = symbol_sets.setdefault(
+                        values, len(symbol_sets)
+                    )
+                else:
+                    entry["threshold"] = float(next(iter(values)))
+                # Pushed in reverse so the left subtree is numbered first
+                stack.append((node["right"], index))
+                stack.append((node["left"], index))
+
+        membership = np.zeros((len(symbol_sets), len(symbols) + 1), dtype=bool)
+        for values, set_id in symbol_sets.items():
+            membership[set_id, [symbols[value] for value in values]] = True
+
+        def column(key, dtype):
+            return np.array([node[key] for node in nodes], dtype=dtype)
+
+        return cls(
+            predictors=list(predictors),
+            split_kind=column("kind", np.int8),
+            feature=column("feature", np.int32),
+            threshold=column("threshold", np.float64),
+            symbol_set=column("symbol_set", np.int32),
+            left=column("left", np.int32),
+            right=column("right", np.int32),
+            score=column("score", np.float64),
+            gain=column("gain", np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            symbols=symbols,
+            membership=membership,
+        )
+
+    _ARRAYS = (
+        "split_kind",
+        "feature",
+        "threshold",
+        "symbol_set",
+        "left",
+        "right",
+        "score",
+        "gain",
+        "roots",
+        "membership",
+    )
+
+    def __len__(self):
+        return len(self.roots)
+
+    def save(self, path: str):
+        """Writes the arrays as ``.npy`` files, and the names as json."""
+        os.makedirs(path, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "compiled.json"), "w") as f:
+            json.dump({"predictors": self.predictors, "symbols": self.symbols}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledTrees":
+        """Reads the files written by :meth:`save`, memory-mapped if `mmap`."""
+        with open(os.path.join(path, "compiled.json")) as f:
+            names = json.load(f)
+        arrays = {
+            name: np.load(
+                os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None
+            )
+            for name in cls._ARRAYS
+        }
+        return cls(predictors=names["predictors"], symbols=names["symbols"], **arrays)
+
+    def _encode(
+        self, df: Union[pl.DataFrame, pl.LazyFrame]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Converts the predictor columns to a numeric and a symbol code matrix.
+
+        Both matrices have one row per predictor, so the values of a
+        predictor are contiguous in memory. Values that can't be read as a
+        number become NaN, which never satisfies a numeric split. Missing
+        values are encoded as the 'Missing' symbol, and values that never
+        appear in a split as the unknown symbol.
+        """
+        if isinstance(df, pl.LazyFrame):
+            df = df.select(
+                [col for col in self.predictors if col in df.collect_schema().names()]
+            ).collect()
+        missing = [col for col in self.predictors if col not in df.columns]
+        if missing:
+            raise ValueError(f"Predictors missing from the data: {missing}")
+
+        kinds = np.zeros((len(self.predictors), self.IN + 1), dtype=bool)
+        splits = self.feature >= 0
+        kinds[self.feature[splits], self.split_kind[splits]] = True
+        numeric = kinds[:, [self.LT, self.GT, self.EQ]].any(axis=1)
+        symbolic = kinds[:, self.IN]
+
+        unknown = len(self.symbols)
+        values = np.full((len(self.predictors), len(df)), np.nan)
+        codes = np.full((len(self.predictors), len(df)), unknown, dtype=np.int32)
+        for i, name in enumerate(self.predictors):
+            col = df.get_column(name)
+            if numeric[i]:
+                values[i] = (
+                    col.cast(pl.Float64, strict=False).fill_null(np.nan).to_numpy()
+                )
+            if symbolic[i]:
+                codes[i] = (
+                    col.cast(pl.Utf8)
+                    .fill_null("Missing")
+                    .replace_strict(
+                        self.symbols, default=unknown, return_dtype=pl.Int32
+                    )
+                    .to_numpy()
+                )
+        return values, codes
+
+    def _traverse(self, values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Finds the leaf node in every tree for every row.
+
+        Walks each tree level by level, keeping for every node of the
+        current level the rows that reached it. Each split is then one
+        vectorized comparison over those rows, so the Python overhead
+        depends on the number of nodes and not on the number of rows.
+        """
+        n_rows = values.shape[1]
+        leaves = np.empty((n_rows, len(self)), dtype=np.int32)
+        for tree, root in enumerate(self.roots):
+            level = [(root, np.arange(n_rows))]
+            while level:
+                next_level = []
+                for node, rows in level:
+                    kind = self.split_kind[node]
+                    if kind == self.LEAF:
+                        leaves[rows, tree] = node
+                        continue
+                    feature = self.feature[node]
+                    if kind == self.IN:
+                        membership = self.membership[self.symbol_set[node]]
+                        go_left = membership[codes[feature, rows]]
+                    else:
+                        value = values[feature, rows]
+                        threshold = self.threshold[node]
+                        if kind == self.LT:
+                            go_left = value < threshold
+                        elif kind == self.GT:
+                            go_left = value > threshold
+                        else:
+                            go_left = value == threshold
+                    next_level.append((self.left[node], rows[go_left]))
+                    next_level.append((self.right[node], rows[~go_left]))
+                level = next_level
+        return leaves
+
+    def leaves(
+        self, df: Union[pl.DataFrame, pl.LazyFrame], chunk_size: int = 100_000
+    ) -> np.ndarray:
+        """Returns the global index of the leaf reached in each tree.
+
+        Parameters
+        ----------
+        df: Union[pl.DataFrame, pl.LazyFrame]
+            The data to traverse the trees with
+        chunk_size: int, default = 100_000
+            The number of rows to traverse at once
+
+        Returns
+        -------
+        np.ndarray
+            An array of shape (rows, trees)
+        """
+        values, codes = self._encode(df)
+        return np.concatenate(
+            [
+                self._traverse(
+                    values[:, i : i + chunk_size], codes[:, i : i + chunk_size]
+                )
+                for i in range(0, values.shape[1], chunk_size)
+            ]
+            or [np.empty((0, len(self)), dtype=np.int32)]
+        )
+
+    @cached_property
+    def paths(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The splits on the path from the root to each node.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Two arrays of shape (nodes, max depth): the feature of each
+            split on the path (-1 as padding), and the change in score
+            caused by that split, from the score of the split node to the
+            score of the child on the path (0 as padding)
+        """
+        isSplit = self.split_kind != self.LEAF
+        parent = np.full(len(self.score), -1, dtype=np.int32)
+        parent[self.left[isSplit]] = np.flatnonzero(isSplit)
+        parent[self.right[isSplit]] = np.flatnonzero(isSplit)
+
+        levels = []
+        level = np.asarray(self.roots)
+        while len(level) > 0:
+            splits = level[self.split_kind[level] != self.LEAF]
+            level = np.concatenate([self.left[splits], self.right[splits]])
+            if len(level) > 0:
+                levels.append(level)
+
+        features = np.full((len(self.score), len(levels)), -1, dtype=np.int32)
+        deltas = np.zeros((len(self.score), len(levels)))
+        for depth, nodes in enumerate(levels):
+            parents = parent[nodes]
+            features[nodes] = features[parents]
+            deltas[nodes] = deltas[parents]
+            features[nodes, depth] = self.feature[parents]
+            deltas[nodes, depth] = self.score[nodes] - self.score[parents]
+        return features, deltas
+
+    def contributions(self, leaves: np.ndarray) -> np.ndarray:
+        """Sums the change in score per predictor over the paths to the leaves.
+
+        Parameters
+        ----------
+        leaves: np.ndarray
+            The leaf per row and tree, as returned by :meth:`leaves`
+
+        Returns
+        -------
+        np.ndarray
+            The contributions, of shape (rows, predictors)
+        """
+        features, deltas = self.paths
+        n_rows, n_predictors = leaves.shape[0], len(self.predictors)
+        offsets = np.arange(n_rows)[:, None] * n_predictors
+        total = np.zeros(n_rows * n_predictors)
+        for tree in range(leaves.shape[1]):
+            pathFeatures = features[leaves[:, tree]]
+            onPath = pathFeatures >= 0
+            total += np.bincount(
+                (offsets + pathFeatures)[onPath],
+                weights=deltas[leaves[:, tree]][onPath],
+                minlength=len(total),
+            )
+        return total.reshape(n_rows, n_predictors)
+
+    def score_batch(
+        self, df: Union[pl.DataFrame, pl.LazyFrame], chunk_size: int = 100_000
+    ) -> pl.Series:
+        """Computes the propensity per row, see :meth:`ADMTreesModel.score_batch`"""
+        values, codes = self._encode(df)
+        total = np.concatenate(
+            [
+                self.score[
+                    self._traverse(
+                        values[:, i : i + chunk_size], codes[:, i : i + chunk_size]
+                    )
+                ].sum(axis=1)
+                for i in range(0, values.shape[1], chunk_size)
+            ]
+            or [np.empty(0)]
+        )
+        return pl.Series("Score", 1 / (1 + np.exp(-total)))
+
+
+# The compiled trees of the model being evaluated, set once per worker process
+_evaluationTrees = None
+
+
+def _initEvaluationWorker(compiled: CompiledTrees):
+    global _evaluationTrees
+    _evaluationTrees = compiled
+
+
+def _hdsColumn(predictor: str, columns: List[str]) -> Optional[str]:
+    """Finds the HDS column for a predictor, see :meth:`ADMTreesModel.evaluate_hds`"""
+    candidates = [predictor, predictor.replace(".", "_")]
+    if predictor.startswith("py"):
+        candidates.append(f"Context_{predictor[2:]}")
+    return next((name for name in candidates if name in columns), None)
+
+
+def _evaluateChunk(
+    chunk: pl.DataFrame,
+    outcome_column: str,
+    positive_outcomes: List[str],
+    negative_outcomes: List[str],
+    n_bins: int,
+    compiled: Optional[CompiledTrees] = None,
+) -> np.ndarray:
+    """Scores one chunk of an HDS export, counting the responses per bin.
+
+    Returns
+    -------
+    np.ndarray
+        Of shape (3, n_bins): the positives, the negatives and the
+        summed propensities per propensity bin
+    """
+    compiled = compiled if compiled is not None else _evaluationTrees
+    chunk = chunk.filter(
+        pl.col(outcome_column).is_in(positive_outcomes + negative_outcomes)
+    )
+    predictors = []
+    for predictor in compiled.predictors:
+        column = _hdsColumn(predictor, chunk.columns)
+        if column is None:
+            logging.debug(f"Predictor {predictor} not in the data, so missing")
+            predictors.append(pl.lit(None, dtype=pl.Utf8).alias(predictor))
+        else:
+            predictors.append(pl.col(column).alias(predictor))
+    data = chunk.select(predictors)
+    positive = chunk.get_column(outcome_column).is_in(positive_outcomes).to_numpy()
+
+    propensity = compiled.score_batch(data).to_numpy()
+    bins = np.minimum((propensity * n_bins).astype(np.int64), n_bins - 1)
+    return np.stack(
+        [
+            np.bincount(bins, weights=positive, minlength=n_bins),
+            np.bincount(bins, weights=~positive, minlength=n_bins),
+            np.bincount(bins, weights=propensity, minlength=n_bins),
+        ]
+    )
+
+
+class _StoredTree(dict):
+    """A tree in a TreeStore, with its cached split counts."""
+
+    __slots__ = ("__weakref__", "splitCounts")
+
+
+class TreeStore:
+    """Content-addressed storage of decoded trees.
+
+    Consecutive snapshots of an AGB model typically share most of their
+    trees, as only the trees added since the previous snapshot differ.
+    The store keeps each distinct tree once, keyed by a hash of its
+    content, so snapshots can reference the shared trees and statistics
+    computed for a tree can be reused by every snapshot containing it.
+
+    The store only holds weak references to the trees: a tree, and the
+    statistics computed for it, are dropped as soon as no decoded model
+    refers to it anymore. The memory use of the store is therefore
+    bounded by the decoded models kept in the caches of the MultiTrees.
+
+    A store can be shared between several MultiTrees objects, for
+    instance between the models of the same configuration.
+    """
+
+    def __init__(self):
+        self.trees: Dict[str, Dict] = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self.trees)
+
+    def __contains__(self, key):
+        return key in self.trees
+
+    @staticmethod
+    def treeHash(tree: Dict) -> str:
+        """Returns the content hash of a (decoded) tree."""
+        return hashlib.sha1(
+            json.dumps(tree, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _intern(self, key: str, tree: Dict) -> Dict:
+        stored = self.trees.get(key)
+        if stored is None:
+            stored = _StoredTree(tree)
+            stored.splitCounts = {}
+            self.trees[key] = stored
+        return stored
+
+    def addModel(
+        self, model: ADMTreesModel, hashes: Optional[List[str]] = None
+    ) -> List[str]:
+        """Adds the trees of a model to the store.
+
+        The trees of the model are replaced by the shared trees in the
+        store, so identical trees across snapshots are held only once.
+
+        Parameters
+        ----------
+        model: ADMTreesModel
+            The model to add the trees of
+        hashes: List[str], optional
+            The content hashes of the trees, if known from before
+
+        Returns
+        -------
+        List[str]
+            The content hashes of the trees of the model, in order
+        """
+        if hashes is None:
+            hashes = [self.treeHash(tree) for tree in model.model]
+        model.model[:] = [
+            self._intern(key, tree) for key, tree in zip(hashes, model.model)
+        ]
+        return hashes
+
+    def update(self, other: "TreeStore"):
+        """Adds the trees and statistics of another store to this one."""
+        for key, tree in list(other.trees.items()):
+            self.trees.setdefault(key, tree)
+
+    def splitCounts(
+        self, key: str, predictorCategorization=None, context_keys=None
+    ) -> collections.Counter:
+        """Counts the splits per variable type in a tree.
+
+        The counts are cached per tree, categorization and context keys.
+
+        Parameters
+        ----------
+        key: str
+            The content hash of the tree
+        predictorCategorization: function, optional
+            Function taking a predictor name and the context keys and
+            returning its category. Defaults to
+            ADMTreesModel.defaultPredictorCategorization
+        context_keys: list, optional
+            The context keys of the model
+        """
+        tree = self.trees[key]
+        cacheKey = (predictorCategorization, tuple(context_keys or ()))
+        if cacheKey not in tree.splitCounts:
+            categorize = (
+                predictorCategorization
+                if predictorCategorization is not None
+                else ADMTreesModel.defaultPredictorCategorization
+            )
+            counter = collections.Counter()
+            nodes = [tree]
+            while nodes:
+                node = nodes.pop()
+                if "split" in node:
+                    variable = ADMTreesModel.parseSplitValuesWithSpaces(
+                        node["split"]
+                    )[0]
+                    counter.update([categorize(variable, context_keys)])
+                nodes.extend(node[key] for key in ("right", "left") if key in node)
+            tree.splitCounts[cacheKey] = counter
+        return tree.splitCounts[cacheKey]
+
+
 @dataclass
 class MultiTrees:
+    """A collection of snapshots of the same AGB model, by snapshot time.
+
+    The snapshots can be supplied as ADMTreesModel objects, or as the
+    compressed model data from the datamart. Compressed snapshots are
+    only decoded when accessed, and the most recently used decoded
+    models are kept in a cache of at most `cache_size` models, so
+    memory use does not grow with the number of snapshots.
+
+    Identical trees across snapshots are stored once, in a TreeStore.
+    Each snapshot is kept as a view on that store, by the content
+    hashes of its trees, and statistics per tree are computed only
+    once for all snapshots that share it. The store keeps the trees
+    only while a decoded model refers to them.
+
+    Parameters
+    ----------
+    trees: dict
+        The snapshots, as a dict of timestamp to either an ADMTreesModel
+        or the zlib-compressed model data
+    model_name: str, optional
+        The name of the model (typically the configuration)
+    context_keys: list, optional
+        The context keys, passed on to the decoded models
+    cache_size: int, default = 8
+        The number of decoded models to keep in memory
+    store: TreeStore, optional
+        The store of distinct trees, which can be shared between
+        MultiTrees objects. A new store is created if not given.
+    """
+
     trees: dict
     model_name: str = None
     context_keys: list = None
+    cache_size: int = 8
+    store: TreeStore = field(default_factory=TreeStore, repr=False)
+    _cache: collections.OrderedDict = field(
+        default_factory=collections.OrderedDict, init=False, repr=False
+    )
+    _views: dict = field(default_factory=dict, init=False, repr=False)
 
     def __repr__(self):
         mod = "" if self.model_name is None else f" for {self.model_name}"
@@ -1018,23 +2006,72 @@ class MultiTrees:
 
     def __getitem__(self, index):
         if isinstance(index, int):
-            return list(self.trees.items())[index]
-        elif isinstance(index, pl.datetime):
-            return self.trees[index]
+            timestamp = list(self.trees.keys())[index]
+            return timestamp, self.getModel(timestamp)
+        return self.getModel(index)
 
     def __len__(self):
         return len(self.trees)
 
+    def __iter__(self):
+        for timestamp in self.trees.keys():
+            yield timestamp, self.getModel(timestamp)
+
     def __add__(self, other):
         if isinstance(other, MultiTrees):
-            return MultiTrees({**self.trees, **other.trees})
+            if other.store is not self.store:
+                self.store.update(other.store)
+            combined = MultiTrees(
+                {**self.trees, **other.trees},
+                model_name=self.model_name,
+                context_keys=self.context_keys,
+                cache_size=self.cache_size,
+                store=self.store,
+            )
+            combined._views = {**self._views, **other._views}
+            return combined
         elif isinstance(other, ADMTreesModel):
-            return MultiTrees(
-                {
-                    **self.trees,
-                    **{pl.datetime(other.properties["factoryUpdateTime"]): other},
-                }
+            combined = MultiTrees(
+                {**self.trees, other.properties["factoryUpdateTime"]: other},
+                model_name=self.model_name,
+                context_keys=self.context_keys,
+                cache_size=self.cache_size,
+                store=self.store,
             )
+            combined._views = dict(self._views)
+            return combined
+
+    def getModel(self, timestamp) -> ADMTreesModel:
+        """Returns the model for a snapshot, decoding it if needed."""
+        tree = self.trees[timestamp]
+        if isinstance(tree, ADMTreesModel):
+            self._addView(timestamp, tree)
+            return tree
+        if timestamp in self._cache:
+            self._cache.move_to_end(timestamp)
+            return self._cache[timestamp]
+
+        logging.debug(f"Decoding snapshot {timestamp}")
+        model = ADMTreesModel(tree, context_keys=self.context_keys)
+        self._addView(timestamp, model)
+        if self.cache_size > 0:
+            self._cache[timestamp] = model
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return model
+
+    def _addView(self, timestamp, model: ADMTreesModel):
+        """Points the trees of a snapshot's model to the shared store."""
+        if timestamp in self._views:
+            self.store.addModel(model, self._views[timestamp][0])
+            return
+        self._views[timestamp] = (self.store.addModel(model), model.context_keys)
+
+    def getTreeHashes(self, timestamp) -> List[str]:
+        """Returns the content hashes of the trees in a snapshot."""
+        if timestamp not in self._views:
+            self.getModel(timestamp)
+        return self._views[timestamp][0]
 
     @property
     def first(self):
@@ -1045,11 +2082,26 @@ class MultiTrees:
         return self[-1]
 
     def computeOverTime(self, predictorCategorization=None):
+        """Computes the splits per variable type for each snapshot.
+
+        Snapshots are decoded one at a time, so only the decoded models
+        in the cache are in memory at any point. The counts are computed
+        once per distinct tree and shared between the snapshots, and
+        snapshots whose trees are all still in the store are not decoded
+        again.
+        """
         outdf = []
-        for timestamp, tree in self.trees.items():
-            to_plot = tree.splitsPerVariableType[0]
-            if predictorCategorization is not None:
-                to_plot = tree.computeCategorizationOverTime(predictorCategorization)[0]
+        for timestamp in self.trees.keys():
+            hashes = self.getTreeHashes(timestamp)
+            context_keys = self._views[timestamp][1]
+            # Holding on to the trees keeps them, and their counts, in the store
+            trees = [self.store.trees.get(key) for key in hashes]
+            if any(tree is None for tree in trees):
+                trees = self.getModel(timestamp).model
+            to_plot = [
+                self.store.splitCounts(key, predictorCategorization, context_keys)
+                for key in hashes
+            ]
             outdf.append(
                 pl.DataFrame(to_plot).with_columns(
                     SnapshotTime=pl.lit(timestamp).str.to_date(format="%Y-%m-%d %X")
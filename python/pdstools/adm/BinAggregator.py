@@ -462,6 +462,7 @@ class BinAggregator:
                 .then(pl.lit(None))
                 .otherwise(
                     pl.col("BinSymbol")
+                    .cast(pl.Utf8)
                     .str.split(by=",")
                     .list.eval(pl.element().str.strip_chars())
                 )
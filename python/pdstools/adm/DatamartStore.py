@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Union
+
+import polars as pl
+
+from .. import pega_io
+from .ADMDatamart import ADMDatamart
+
+logger = logging.getLogger(__name__)
+
+
+class DatamartStore:
+    """An incrementally updated store of ADM datamart snapshots.
+
+    Instead of re-reading the full history of datamart exports every time,
+    the store keeps the typed rows of every export it has seen as Parquet
+    files, partitioned by snapshot date::
+
+        store/
+            manifest.json
+            Last.parquet
+            modelData/SnapshotDate=2024-01-01/<fingerprint>.parquet
+            predictorData/SnapshotDate=2024-01-01/<fingerprint>.parquet
+
+    Calling :meth:`update` detects export files that are not in the store yet,
+    and only parses, types and appends their rows. Snapshots that are already
+    in the store, for instance from an earlier full export, are skipped. The
+    derived
+    `Last_Positives` and `Last_ResponseCount` columns are kept in a separate
+    table, which is only recomputed for the models that received new
+    snapshots.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        The directory holding the store, created if it does not exist
+
+    Examples
+    --------
+    >>> store = DatamartStore("datamart_store")
+    >>> store.update("exports")
+    >>> dm = store.to_datamart()
+    """
+
+    tables = ("modelData", "predictorData")
+    derived_columns = ("Last_Positives", "Last_ResponseCount")
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def manifest(self) -> Dict[str, Dict[str, str]]:
+        """The ingested export files per table, keyed by their fingerprint."""
+        try:
+            with open(self.path / "manifest.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {table: {} for table in self.tables}
+
+    def _write_manifest(self, manifest: Dict[str, Dict[str, str]]):
+        tmp_file = self.path / f"manifest.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, self.path / "manifest.json")
+
+    def update(
+        self,
+        path: Union[str, Path] = ".",
+        *,
+        subset: bool = True,
+        drop_cols: Optional[list] = None,
+        include_cols: Optional[list] = None,
+        extract_keys: bool = False,
+        **reading_opts,
+    ) -> Dict[str, List[str]]:
+        """Appends all export files in a directory that are not in the store yet.
+
+        Export files are recognized by their default names, as in
+        :meth:`pdstools.pega_io.File.get_latest_file`, and identified by
+        their fingerprint, so renamed copies of an ingested file are skipped.
+
+        Parameters
+        ----------
+        path : Union[str, Path], default = "."
+            The directory with the datamart exports
+
+        Keyword arguments
+        -----------------
+        subset, drop_cols, include_cols, extract_keys, **reading_opts
+            Passed on to :class:`ADMDatamart` to import every new file.
+            These should be the same for every update of a store.
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            The newly ingested files per table
+        """
+        supported = {".json", ".csv", ".zip", ".parquet", ".feather", ".ipc", ".arrow"}
+        files = sorted(
+            f
+            for f in os.listdir(path)
+            if os.path.isfile(os.path.join(path, f))
+            and os.path.splitext(f)[-1].lower() in supported
+        )
+        manifest = self.manifest
+        added = {table: [] for table in self.tables}
+        affected_models = []
+        for table in self.tables:
+            for file in pega_io.getMatches(files, table):
+                fingerprint = pega_io.get_file_fingerprint(os.path.join(path, file))
+                if fingerprint in manifest[table]:
+                    continue
+                logger.info(f"Appending {file} to the {table} store")
+                dm = ADMDatamart(
+                    path,
+                    "lazy",
+                    model_filename=file if table == "modelData" else None,
+                    predictor_filename=file if table == "predictorData" else None,
+                    subset=subset,
+                    drop_cols=drop_cols,
+                    include_cols=include_cols,
+                    extract_keys=extract_keys,
+                    **reading_opts,
+                )
+                df = getattr(dm, table)
+                if table == "modelData":
+                    df = df.drop("SuccessRate", *self.derived_columns)
+                df = self._new_snapshots(table, df.collect())
+                self._append(table, df, fingerprint)
+                if table == "modelData":
+                    affected_models.append(df.get_column("ModelID").unique())
+                manifest[table][fingerprint] = file
+                added[table].append(file)
+            if affected_models:
+                self._update_derived(pl.concat(affected_models).unique())
+                affected_models = []
+            self._write_manifest(manifest)
+
+        return added
+
+    def _new_snapshots(self, table: str, df: pl.DataFrame) -> pl.DataFrame:
+        """Leaves out the rows of model snapshots that are in the store already."""
+        existing = self._scan_partitions(table)
+        if existing is None:
+            return df
+        dates = df.get_column("SnapshotTime").dt.date().unique()
+        keys = (
+            existing.filter(pl.col("SnapshotDate").is_in(dates))
+            .select(
+                pl.col("ModelID").cast(pl.Utf8),
+                pl.col("SnapshotTime").cast(df.schema["SnapshotTime"]),
+            )
+            .unique()
+            .collect()
+        )
+        new = df.join(
+            keys,
+            left_on=[pl.col("ModelID").cast(pl.Utf8), "SnapshotTime"],
+            right_on=["ModelID", "SnapshotTime"],
+            how="anti",
+        )
+        if new.height < df.height:
+            logger.info(
+                f"Skipping {df.height - new.height} {table} rows of snapshots "
+                "that are in the store already"
+            )
+        return new
+
+    def _append(self, table: str, df: pl.DataFrame, fingerprint: str):
+        """Writes the rows of one export file into the snapshot date partitions."""
+        df = df.with_columns(SnapshotDate=pl.col("SnapshotTime").dt.date())
+        for (date,), partition in df.partition_by(
+            "SnapshotDate", as_dict=True
+        ).items():
+            if date is None:
+                date = "__HIVE_DEFAULT_PARTITION__"
+            directory = self.path / table / f"SnapshotDate={date}"
+            directory.mkdir(parents=True, exist_ok=True)
+            partition.drop("SnapshotDate").write_parquet(
+                directory / f"{fingerprint}.parquet", statistics=True
+            )
+
+    def _update_derived(self, models: pl.Series):
+        """Recomputes the derived model columns for the given ModelIDs only."""
+        last = (
+            self._scan_partitions("modelData")
+            .filter(pl.col("ModelID").is_in(models))
+            .select("ModelID", "SnapshotTime", "Positives", "ResponseCount")
+            .sort("SnapshotTime")
+            .with_columns(
+                ADMDatamart._last_timestamp("Positives"),
+                ADMDatamart._last_timestamp("ResponseCount"),
+            )
+            .group_by("ModelID")
+            .agg(pl.col(list(self.derived_columns)).first())
+            .collect()
+        )
+        last_file = self.path / "Last.parquet"
+        if last_file.exists():
+            previous = pl.read_parquet(last_file)
+            last = pl.concat(
+                [previous.filter(~pl.col("ModelID").is_in(models)), last],
+                how="vertical_relaxed",
+            )
+        tmp_file = self.path / f"Last.{os.getpid()}.tmp"
+        last.write_parquet(tmp_file)
+        os.replace(tmp_file, last_file)
+
+    def _scan_partitions(self, table: str) -> Optional[pl.LazyFrame]:
+        if not (self.path / table).exists():
+            return None
+        return pl.scan_parquet(
+            self.path / table / "**" / "*.parquet",
+            hive_partitioning=True,
+            hive_schema={"SnapshotDate": pl.Date},
+        )
+
+    def scan(
+        self, table: Literal["modelData", "predictorData"]
+    ) -> Optional[pl.LazyFrame]:
+        """Scans one of the tables in the store.
+
+        The model data includes the derived `SuccessRate`, `Last_Positives`
+        and `Last_ResponseCount` columns, as computed by :class:`ADMDatamart`.
+
+        Parameters
+        ----------
+        table : Literal["modelData", "predictorData"]
+            The table to scan
+
+        Returns
+        -------
+        Optional[pl.LazyFrame]
+            The table, or None if no export for it has been ingested
+        """
+        df = self._scan_partitions(table)
+        if df is None:
+            return None
+        # The partition column is only there to prune the files
+        df = df.drop("SnapshotDate")
+        if table != "modelData":
+            return df
+        return df.join(
+            pl.scan_parquet(self.path / "Last.parquet"), on="ModelID", how="left"
+        ).with_columns(
+            (pl.col("Positives") / pl.col("ResponseCount"))
+            .fill_nan(pl.lit(0))
+            .alias("SuccessRate"),
+        )
+
+    def to_datamart(self, **kwargs) -> ADMDatamart:
+        """Creates an :class:`ADMDatamart` from the contents of the store.
+
+        The derived columns are taken from the store instead of being
+        recomputed over the full history.
+
+        Keyword arguments
+        -----------------
+        Any:
+            Passed on to :class:`ADMDatamart`, such as a query
+
+        Returns
+        -------
+        ADMDatamart
+            The datamart with all snapshots in the store
+        """
+        include_cols = list(kwargs.pop("include_cols", None) or [])
+        return ADMDatamart(
+            model_df=self.scan("modelData"),
+            predictor_df=self.scan("predictorData"),
+            include_cols=include_cols + list(self.derived_columns),
+            **kwargs,
+        )
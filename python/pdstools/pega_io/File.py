@@ -1,11 +1,13 @@
 import datetime
+import hashlib
+import itertools
 import logging
 import os
 import re
 import urllib
 import zipfile
 from io import BytesIO
-from typing import Literal, Union
+from typing import Iterator, List, Literal, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -31,6 +33,8 @@ def readDSExport(
     - .feather
     - .ipc
     - .parquet
+    - a directory with a hive-partitioned Parquet dataset, as written by
+      :meth:`pdstools.adm.ADMDatamart.save_data` with `partitioned=True`
 
     It automatically infers the default file names for both model data as well as predictor data.
     If you supply either 'modelData' or 'predictorData' as the 'file' argument, it will search for them.
@@ -94,7 +98,9 @@ def readDSExport(
     # If the filename is simply a string, then we first
     # extract the extension of the file, then look for
     # the file in the user's directory.
-    if os.path.isfile(os.path.join(path, filename)):
+    if os.path.isfile(os.path.join(path, filename)) or is_partitioned_dataset(
+        os.path.join(path, filename)
+    ):
         logging.debug("File found in directory")
         file = os.path.join(path, filename)
     else:
@@ -124,6 +130,15 @@ def readDSExport(
             logging.info(f"File not found: {path}/{filename}")
             return None
 
+    if isinstance(file, str) and is_partitioned_dataset(file):
+        logging.debug("Partitioned dataset found, scanning with hive partitioning")
+        # The snapshot date partitions only serve to prune the files to read
+        return pl.scan_parquet(
+            os.path.join(file, "**", "*.parquet"),
+            hive_partitioning=True,
+            hive_schema={"Configuration": pl.Categorical, "SnapshotDate": pl.Date},
+        ).drop("SnapshotDate", strict=False)
+
     if "extension" not in vars():
         name, extension = os.path.splitext(file)
 
@@ -292,11 +307,55 @@ def readMultiZip(files: list, zip_type: Literal["gzip"] = "gzip", verbose: bool
     return df
 
 
+def readHDSChunks(
+    files: Union[str, List[str]], chunk_size: int = 100_000
+) -> Iterator[pl.DataFrame]:
+    """Reads Historical Dataset (HDS) exports in chunks of records.
+
+    An HDS export is either a multi-line JSON file, or a zip file of
+    multi-line JSON files. The lines are read lazily, so only one chunk
+    is in memory at a time, regardless of the size of the export.
+
+    Parameters
+    ----------
+    files: Union[str, List[str]]
+        The path to the export, or a list of paths
+    chunk_size: int, default = 100_000
+        The maximum number of records per chunk
+
+    Yields
+    ------
+    pl.DataFrame
+        The records of each chunk
+    """
+
+    def chunks(lines):
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield pl.read_ndjson(BytesIO(b"".join(chunk)))
+
+    for file in [files] if isinstance(files, (str, os.PathLike)) else files:
+        if zipfile.is_zipfile(file):
+            with zipfile.ZipFile(file, mode="r") as z:
+                for name in sorted(z.namelist()):
+                    if name.startswith("__MACOSX") or name.endswith("/"):
+                        continue
+                    logging.debug(f"Reading {name} from {file}")
+                    with z.open(name) as f:
+                        yield from chunks(line for line in f if line.strip())
+        else:
+            with open(file, "rb") as f:
+                yield from chunks(line for line in f if line.strip())
+
+
 def get_latest_file(path: str, target: str, verbose: bool = False) -> str:
     """Convenience method to find the latest model snapshot.
     It has a set of default names to search for and finds all files who match it.
     Once it finds all matching files in the directory, it chooses the most recent one.
-    Supports [".json", ".csv", ".zip", ".parquet", ".feather", ".ipc"].
+    Supports [".json", ".csv", ".zip", ".parquet", ".feather", ".ipc"],
+    as well as hive-partitioned Parquet datasets.
     Needs a path to the directory and a target of either 'modelData' or 'predictorData'.
 
     Parameters
@@ -319,8 +378,15 @@ def get_latest_file(path: str, target: str, verbose: bool = False) -> str:
 
     supported = [".json", ".csv", ".zip", ".parquet", ".feather", ".ipc", ".arrow"]
 
-    files_dir = [f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))]
-    files_dir = [f for f in files_dir if os.path.splitext(f)[-1].lower() in supported]
+    files_dir = [
+        f
+        for f in os.listdir(path)
+        if (
+            os.path.isfile(os.path.join(path, f))
+            and os.path.splitext(f)[-1].lower() in supported
+        )
+        or is_partitioned_dataset(os.path.join(path, f))
+    ]
     if verbose:
         print(files_dir)  # pragma: no cover
     matches = getMatches(files_dir, target)
@@ -346,6 +412,54 @@ def get_latest_file(path: str, target: str, verbose: bool = False) -> str:
     return paths[np.argmax(dates)]
 
 
+def get_file_fingerprint(file: str, chunk_size: int = 2**24) -> str:
+    """Computes a fingerprint of a file from its size, mtime and contents.
+
+    Two fingerprints are only equal if the file has not been touched or
+    modified in between, which makes it usable as a cache key for data
+    derived from the file.
+
+    Parameters
+    ----------
+    file : str
+        The path to the file
+    chunk_size : int, default = 2**24
+        The number of bytes to hash at a time
+
+    Returns
+    -------
+    str
+        The hexadecimal fingerprint of the file
+    """
+    stat = os.stat(file)
+    digest = hashlib.blake2b(
+        f"{stat.st_size}:{stat.st_mtime_ns}".encode(), digest_size=16
+    )
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_partitioned_dataset(path: str) -> bool:
+    """Whether a path is a directory holding a hive-partitioned dataset.
+
+    Parameters
+    ----------
+    path : str
+        The path to check
+
+    Returns
+    -------
+    bool
+        True if the path is a directory with `key=value` subdirectories
+    """
+    return os.path.isdir(path) and any(
+        "=" in entry and os.path.isdir(os.path.join(path, entry))
+        for entry in os.listdir(path)
+    )
+
+
 def getMatches(files_dir, target):
     matches = []
     default_model_names = [
@@ -387,6 +501,8 @@ def cache_to_file(
     name: str,
     cache_type: Literal["ipc", "parquet"] = "ipc",
     compression: str = "uncompressed",
+    partition_by: Optional[List[str]] = None,
+    streaming: bool = False,
 ) -> str:
     """Very simple convenience function to cache data.
     Caches in arrow format for very fast reading.
@@ -404,6 +520,14 @@ def cache_to_file(
         Default is IPC, also supports parquet
     compression: str
         The compression to apply, default is uncompressed
+    partition_by: Optional[List[str]]
+        If given, writes a hive-partitioned Parquet dataset by these columns
+        to a directory with the given name, with statistics for every file.
+        Only supported for the parquet cache type. The data is collected
+        into memory first, also when streaming.
+    streaming: bool
+        Whether to write a LazyFrame with the streaming engine of Polars,
+        without collecting it into memory first where the query allows it
 
     Returns
     -------
@@ -413,8 +537,35 @@ def cache_to_file(
     import pathlib
 
     outpath = pathlib.Path(path).joinpath(pathlib.Path(name))
+    if partition_by is not None and cache_type != "parquet":
+        raise ValueError("Partitioning is only supported for parquet files.")
     if isinstance(df, pl.LazyFrame):
-        df = df.collect()
+        if streaming and partition_by is None:
+            try:
+                if cache_type == "ipc":
+                    outpath = f"{outpath}.arrow"
+                    df.sink_ipc(
+                        outpath,
+                        compression=(
+                            None if compression == "uncompressed" else compression
+                        ),
+                    )
+                if cache_type == "parquet":
+                    outpath = f"{outpath}.parquet"
+                    df.sink_parquet(outpath, compression=compression)
+                return outpath
+            except pl.exceptions.InvalidOperationError:
+                logging.debug("Query can not be sunk, collecting it instead")
+                outpath = pathlib.Path(path).joinpath(pathlib.Path(name))
+        df = df.collect(streaming=streaming)
+    if partition_by is not None:
+        df.write_parquet(
+            outpath,
+            compression=compression,
+            statistics=True,
+            partition_by=partition_by,
+        )
+        return str(outpath)
     if cache_type == "ipc":
         outpath = f"{outpath}.arrow"
         df.write_ipc(outpath, compression=compression)
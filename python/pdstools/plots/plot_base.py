@@ -1,3 +1,4 @@
+from functools import cached_property
 from typing import Any, Dict, List, Optional, Union
 
 import plotly.express as px
@@ -7,12 +8,29 @@ import plotly.graph_objs as go
 import polars as pl
 from plotly.graph_objects import Figure
 
-from ..utils.cdh_utils import lift, weighted_average_polars, weighted_performance_polars
+from ..utils.cdh_utils import (
+    expand_snapshots,
+    lift,
+    weighted_average_polars,
+    weighted_performance_polars,
+)
 from ..utils.errors import NotApplicableError
 from ..utils.types import any_frame
 from .plots_plotly import ADMVisualisations as plotly
 
 
+def _decode_categoricals(df: Any) -> Any:
+    """Casts categorical columns to strings in the data returned by plots.
+
+    The tables keep text columns as categoricals internally, but the data
+    returned with `return_df` has string columns, so it can be compared and
+    joined with other frames.
+    """
+    if isinstance(df, (pl.DataFrame, pl.LazyFrame)):
+        return df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+    return df
+
+
 class Plots:
     """
     Base plotting class
@@ -25,6 +43,9 @@ class Plots:
         A flag indicating whether the object has predictor data.
     hasCombined : bool
         A flag indicating whether the object has combined data.
+    hasMultipleSnapshots : bool
+        A flag indicating whether the model data has multiple snapshots.
+        Only computed when first used.
     AvailableVisualisations : pl.DataFrame
         A dataframe with available visualizations and whether they require model data, predictor data, or multiple snapshots.
     import_strategy : str
@@ -37,14 +58,15 @@ class Plots:
     def __init__(self):
         self.hasModels = self.modelData is not None
         self.hasPredictorBinning = self.predictorData is not None
-        self.hasCombined = hasattr(self, "combinedData")
-        if self.import_strategy == "eager":
-            if self.hasModels:
-                self.hasMultipleSnapshots = (
-                    self.modelData.select(pl.col("SnapshotTime").n_unique() > 1)
-                    .collect()
-                    .item()
-                )
+        self.hasCombined = self.hasModels and self.hasPredictorBinning
+
+    @cached_property
+    def hasMultipleSnapshots(self) -> bool:
+        if not self.hasModels:
+            return False
+        return self._collect(
+            self.modelData.select(pl.col("SnapshotTime").n_unique() > 1)
+        ).item()
 
     # TODO reconsider those tables
 
@@ -193,6 +215,8 @@ class Plots:
             )
 
         df = getattr(self, table)
+        if not last and "ValidFrom" in df.collect_schema().names():
+            df = expand_snapshots(df, getattr(self, "predictorSnapshots", None))
         df_columns = df.collect_schema().names()
         if table != "predictorData":
             required_columns = required_columns.union(self.context_keys)
@@ -221,8 +245,7 @@ class Plots:
 
         return (
             df.select(list(required_columns)).with_columns(
-                pl.col(pl.Categorical).cast(pl.Utf8),
-                pl.col(pl.Datetime).dt.replace_time_zone(None),
+                pl.col(pl.Datetime).dt.replace_time_zone(None)
             ),
             facets,
         )
@@ -312,6 +335,11 @@ class Plots:
         """
         if kwargs.pop("verbose", False):
             print(partition)
+        if isinstance(kwargs.get("df"), pl.DataFrame):
+            # Categoricals are only decoded for the, by now aggregated, plot data
+            kwargs["df"] = kwargs["df"].with_columns(
+                pl.col(pl.Categorical).cast(pl.Utf8)
+            )
         if len(facets) > 0 and facets[0] is not None:
             figlist = []
             if not partition:
@@ -398,9 +426,9 @@ class Plots:
         df = df.with_columns(
             (pl.col(["Performance"]) * pl.lit(100)).round(kwargs.pop("round", 5))
         )
-        df = df.collect()
+        df = self._collect(df)
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -511,9 +539,9 @@ class Plots:
         if metric == "Performance":
             metric = "weighted_performance"
 
-        df = df.collect()
+        df = self._collect(df)
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -596,10 +624,10 @@ class Plots:
                 .select(facets),
                 on=facets,
             )
-        df = df.collect()
+        df = self._collect(df)
 
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -677,11 +705,11 @@ class Plots:
         df, _ = self._subset_data(table, required_columns, query)
         if modelids is not None:
             df = df.filter(pl.col("ModelID").is_in(modelids))
-        df = df.filter(pl.col("PredictorName") == "Classifier").collect()
+        df = self._collect(df.filter(pl.col("PredictorName") == "Classifier"))
         if df.shape[0] == 0:
             raise ValueError(f"There is no data for the provided modelids {modelids}")
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             ["ModelID"],
@@ -752,7 +780,7 @@ class Plots:
             df = df.filter(pl.col("ModelID").is_in(modelids))
         if predictors is not None:
             df = df.filter(pl.col("PredictorName").is_in(predictors))
-        df = df.collect()
+        df = self._collect(df)
 
         if df["ModelID"].n_unique() == 0:
             raise ValueError(
@@ -760,7 +788,7 @@ class Plots:
             )
 
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             ["ModelID", "PredictorName"],
@@ -852,7 +880,7 @@ class Plots:
         )
 
         separate = kwargs.pop("separate", False)
-        df = df.collect()
+        df = self._collect(df)
 
         if separate:
             partition = "facet"
@@ -886,7 +914,7 @@ class Plots:
         if to_plot in ["PerformanceBin", "FeatureImportance"]:
             df = df.with_columns(pl.col(to_plot) * 100)
         if kwargs.pop("return_df", False):
-            return df, order
+            return _decode_categoricals(df), order
 
         return self.facettedPlot(
             facets,
@@ -973,7 +1001,7 @@ class Plots:
         )
         df = df.filter(pl.col("PredictorName").cast(pl.Utf8) != "Classifier")
 
-        df = (
+        df = self._collect(
             df.group_by(facets + ["ModelID", "PredictorCategory"])
             .agg(
                 weighted_average_polars("PerformanceBin", "ResponseCountBin").alias(
@@ -986,7 +1014,7 @@ class Plots:
                     (pl.col("PerformanceBin") * 100),
                 ]
             )
-        ).collect()
+        )
 
         if kwargs.pop("separate", False):
             partition = "facet"
@@ -994,7 +1022,7 @@ class Plots:
             partition = None
 
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -1070,7 +1098,7 @@ class Plots:
                 PredictorCategory=kwargs.get("predictorCategorization")
             )
 
-        df = (
+        df = self._collect(
             df.filter(pl.col("PredictorName") != "Classifier")
             .with_columns((pl.col("PerformanceBin") - 0.5) * 2)
             .group_by(by, "PredictorCategory")
@@ -1084,10 +1112,9 @@ class Plots:
                     (pl.col("Performance") / (pl.sum("Performance").over(by))) * 100
                 )
             )
-            .collect()
         )
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -1167,13 +1194,13 @@ class Plots:
 
         df, facet_col = self._generateFacets(df, by)
         df = df.filter(pl.col("ResponseCount") > 0)
-        if df.collect().shape[0] == 0:
+        if self._collect(df.head(1)).shape[0] == 0:
             raise ValueError("Models do not have any responses")
         df = self.pivot_df(df, by=facet_col, top_n=top_n)
         df = df.with_columns(pl.all().exclude(facet_col) * 100)
 
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         if kwargs.get("separate", False):
             partition = "facet"
@@ -1244,14 +1271,12 @@ class Plots:
             table, required_columns, query, facets=facets, last=last
         )
         df, by = self._generateFacets(df, by)
-        df = (
-            self.response_gain_df(df, by=by)
-            .sort(by + ["TotalModelsFraction"])
-            .collect()
+        df = self._collect(
+            self.response_gain_df(df, by=by).sort(by + ["TotalModelsFraction"])
         )
 
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(facets, plotly().ResponseGain, df=df, by=by, **kwargs)
 
@@ -1301,9 +1326,9 @@ class Plots:
         df, facets = self._subset_data(
             table, required_columns, query, facets=facets, last=last
         )
-        df = self.models_by_positives_df(df, by=by).collect()
+        df = self._collect(self.models_by_positives_df(df, by=by))
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets,
@@ -1382,7 +1407,7 @@ class Plots:
             "Performance_weighted": "Performance weighted mean",
             "Positives_sum": "Positives sum",
         }
-        df = (
+        df = self._collect(
             self.model_summary(by=by, query=query, context_keys=levels)
             .select(pl.col(levels).cast(pl.Utf8), pl.col(list(mapping.keys())))
             .rename(mapping)
@@ -1392,7 +1417,6 @@ class Plots:
             .with_columns(pl.col("(%) Success Rate mean") * 100)
             .fill_nan(pl.lit(50))
             .fill_nan(0)
-            .collect()
         )
 
         if "Issue" in df.columns and "OmniChannel" in df["Issue"].unique():
@@ -1474,7 +1498,7 @@ class Plots:
 
         format = "%" if color_var in list(defaults.keys())[4:] else ""
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
         return plotly().TreeMap(
             df=df,
             color=color,
@@ -1520,14 +1544,13 @@ class Plots:
             .with_columns(pl.lit("Overall").alias("Type"))
         )
 
-        df = (
+        df = self._collect(
             pl.concat([df, overall.select(df.columns)])
             .with_columns(pl.col("Predictor Count").cast(pl.Int64))
             .sort(["EntryType", "Type"])
-            .collect()
         )
         if kwargs.pop("return_df", False):
-            return df
+            return _decode_categoricals(df)
 
         return self.facettedPlot(
             facets, plotting_engine.PredictorCount, df=df, **kwargs
@@ -1640,6 +1663,6 @@ def plotBinningLift(
     )  # split plotly facet label, show only right side
 
     if return_df:
-        return pm_plot_binning_table
+        return _decode_categoricals(pm_plot_binning_table)
     else:
         return fig
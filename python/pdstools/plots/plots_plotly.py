@@ -86,7 +86,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         show_each : bool
@@ -167,7 +167,7 @@ class ADMVisualisations:
         ----------
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
 
@@ -241,7 +241,7 @@ class ADMVisualisations:
         ----------
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
 
@@ -297,7 +297,7 @@ class ADMVisualisations:
             Whether to include bins with no responses at all
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
 
@@ -329,7 +329,7 @@ class ADMVisualisations:
             Model IDs to subset on, optional
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         figsize : tuple
@@ -371,7 +371,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         facets : Optional[Union[list, str]]
@@ -472,7 +472,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         show_each : bool
@@ -539,7 +539,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         show_each : bool
@@ -591,7 +591,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         show_each : bool
@@ -673,7 +673,7 @@ class ADMVisualisations:
             The location the file will be written when written to html
         query : Union[str, dict]
             The query to supply to _apply_query
-            If a string, uses the default Pandas query function
+            If a string, translated into a Polars expression (pandas or SQL syntax)
             Else, a dict of lists where the key is column name in the dataframe
             and the corresponding value is a list of values to keep in the dataframe
         show_each : bool
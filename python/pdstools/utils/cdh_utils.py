@@ -6,13 +6,22 @@ Various utilities to access and manipulate data from Pega for purposes
 of data analysis, reporting and monitoring.
 """
 
+import ast
+import base64
+import collections
 import datetime
+import functools
+import hashlib
 import io
 import logging
+import operator
 import re
 import warnings
 import zipfile
 import tempfile
+import threading
+import tokenize
+import zlib
 from io import StringIO
 from pathlib import Path
 from typing import List, Tuple, Union, Optional
@@ -22,7 +31,6 @@ import polars as pl
 import pytz
 import requests
 
-from .errors import NotEagerError
 from .table_definitions import PegaDefaultTables
 from .types import any_frame
 
@@ -58,12 +66,6 @@ def defaultPredictorCategorization(
     ).alias("PredictorCategory")
 
 
-# TODO: we could make below much more efficient. We're now making everything
-# JSON then extracting. We could first detect if there is any JSON at all
-# ( startswith("{").any() ). Also could do the JSON extract on just the unique pyNames
-# that do start with a {. This could then be merged back with the original data.
-
-
 def _extract_keys(
     df: any_frame,
     col="Name",
@@ -72,34 +74,40 @@ def _extract_keys(
 ) -> any_frame:
     """Extracts keys out of the pyName column
 
-    This is not a lazy operation as we don't know the possible keys
-    in advance. For that reason, we select only the pyName column,
-    extract the keys from that, and then collect the resulting dataframe.
-    This dataframe is then joined back to the original dataframe.
-
-    This is relatively efficient, but we still do need the whole
-    pyName column in memory to do this, so it won't work completely
-    lazily from e.g. s3. That's why it only works with eager mode.
+    This is not a fully lazy operation as we don't know the possible keys
+    in advance. For that reason, we only collect the distinct values of
+    the pyName column and extract the keys from those. The resulting
+    dataframe is then joined back lazily to the original dataframe, so
+    this also works in the lazy and streaming strategies. Only the
+    distinct names need to fit in memory.
 
     The data in column for which the JSON is extract is normalized a
     little by taking out non-space, non-printable characters. Not just
-    ASCII of course. This may be relatively expensive, see notes in
-    code about ideas to speed up.
+    ASCII of course.
 
     Parameters
     ----------
     df: Union[pl.DataFrame, pl.LazyFrame]
         The dataframe to extract the keys from
+    col: str, default = "Name"
+        The column with the (JSON encoded) names
+    capitalize: bool, default = True
+        Whether to capitalize the extracted keys
+    import_strategy: str, default = "eager"
+        With "streaming", the distinct names are collected with the
+        streaming engine of Polars
     """
     # Checking for the 'column is None/Null' case
     if df.collect_schema()[col] != pl.Utf8:
         return df
 
-    if import_strategy != "eager":
-        raise NotEagerError("Extracting keys")
-
+    names = (
+        df.lazy()
+        .select(pl.col(col).unique())
+        .collect(streaming=import_strategy == "streaming")
+    )
     # Checking for the 'empty df' case
-    if len(df.select(col).head(1).collect()) == 0:
+    if names.height == 0:
         return df
 
     def safeName():
@@ -123,17 +131,141 @@ def _extract_keys(
             .otherwise(pl.col(col).cast(pl.Utf8))
         ).alias("tempName")
 
-    series = (
-        df.select(
-            safeName().str.json_decode(infer_schema_length=None),
+    source = "__extract_keys_source"
+    keys = names.select(safeName().str.json_decode(infer_schema_length=None)).unnest(
+        "tempName"
+    )
+    if capitalize:
+        keys = _polarsCapitalize(keys)
+    keys = keys.with_columns(names.get_column(col).alias(source))
+
+    columns = df.collect_schema().names()
+    joined = (
+        df.with_columns(pl.col(col).alias(source))
+        .drop([key for key in keys.columns if key in columns])
+        .join(
+            keys.lazy() if isinstance(df, pl.LazyFrame) else keys, on=source, how="left"
         )
-        .unnest("tempName")
-        .lazy()
-        .collect()
+        .drop(source)
     )
-    if not capitalize:
-        return df.with_columns(series)
-    return df.with_columns(_polarsCapitalize(series))
+    return joined.select(
+        columns + [key for key in keys.columns if key not in columns + [source]]
+    )
+
+
+_QUERY_OPERATORS = {
+    ast.And: operator.and_,
+    ast.Or: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left.is_in(right),
+    ast.NotIn: lambda left, right: ~left.is_in(right),
+    ast.Not: operator.inv,
+    ast.Invert: operator.inv,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_QUERY_METHODS = {
+    "isin": lambda expr, values: expr.is_in(values),
+    "isna": lambda expr: expr.is_null(),
+    "isnull": lambda expr: expr.is_null(),
+    "notna": lambda expr: expr.is_not_null(),
+    "notnull": lambda expr: expr.is_not_null(),
+    "str.contains": lambda expr, pattern: expr.cast(pl.Utf8).str.contains(pattern),
+    "str.startswith": lambda expr, prefix: expr.cast(pl.Utf8).str.starts_with(prefix),
+    "str.endswith": lambda expr, suffix: expr.cast(pl.Utf8).str.ends_with(suffix),
+}
+
+
+def _translate_query_node(node: ast.AST, query: str):
+    if isinstance(node, ast.BoolOp):
+        return functools.reduce(
+            _QUERY_OPERATORS[type(node.op)],
+            [_translate_query_node(value, query) for value in node.values],
+        )
+    if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Compare)):
+        if isinstance(node, ast.BinOp):
+            operands, ops = [node.left, node.right], [node.op]
+        elif isinstance(node, ast.UnaryOp):
+            operands, ops = [node.operand], [node.op]
+        else:
+            operands, ops = [node.left, *node.comparators], node.ops
+        if any(type(op) not in _QUERY_OPERATORS for op in ops):
+            raise ValueError(f"Unsupported operator in query: {query}")
+        operands = [_translate_query_node(operand, query) for operand in operands]
+        if len(operands) == 1:
+            return _QUERY_OPERATORS[type(ops[0])](operands[0])
+        # Chained comparisons, such as `0 < Positives < 10`, are combined with AND
+        return functools.reduce(
+            operator.and_,
+            [
+                _QUERY_OPERATORS[type(op)](left, right)
+                for op, left, right in zip(ops, operands, operands[1:])
+            ],
+        )
+    if isinstance(node, ast.Name):
+        return pl.col(node.id)
+    if isinstance(node, ast.Constant):
+        return pl.lit(node.value)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [ast.literal_eval(element) for element in node.elts]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        method, value = node.func.attr, node.func.value
+        if isinstance(value, ast.Attribute) and value.attr == "str":
+            method, value = f"str.{method}", value.value
+        if method in _QUERY_METHODS and not node.keywords:
+            args = [ast.literal_eval(arg) for arg in node.args]
+            return _QUERY_METHODS[method](_translate_query_node(value, query), *args)
+    raise ValueError(f"Unsupported expression in query: {query}")
+
+
+def _query_to_expr(query: str) -> pl.Expr:
+    """Translates a string query into a Polars expression.
+
+    Both the pandas query syntax, such as ``"Channel == 'Web' and
+    Positives > 10"`` or ``"ModelID.isin(['a', 'b'])"``, and SQL conditions,
+    such as ``"Channel = 'Web' AND ModelID IN ('a', 'b')"``, are supported.
+    Because the result is an expression, the filter can be pushed down into
+    lazy scans instead of materializing the data in pandas.
+
+    Parameters
+    ----------
+    query : str
+        The query to translate
+
+    Returns
+    -------
+    pl.Expr
+        The equivalent Polars expression
+    """
+    try:
+        # Like pandas, `&` and `|` are boolean operators with the precedence
+        # of `and` and `or`, so "A > 1 & B < 2" compares before combining
+        tokens = [
+            (
+                (tokenize.NAME, {"&": "and", "|": "or"}[token.string])
+                if token.type == tokenize.OP and token.string in {"&", "|"}
+                else (token.type, token.string)
+            )
+            for token in tokenize.generate_tokens(io.StringIO(query.strip()).readline)
+        ]
+        tree = ast.parse(tokenize.untokenize(tokens), mode="eval")
+    except (SyntaxError, tokenize.TokenError):
+        return pl.sql_expr(query)
+    return _translate_query_node(tree.body, query)
 
 
 def parsePegaDateTimeFormats(
@@ -221,11 +353,15 @@ def getTypeMapping(df, definition, verbose=False, **timestamp_opts):
     for col, renamedCol in named.items():
         try:
             new_type = getattr(definition, typed[renamedCol])
-            original_type = df.collect_schema()[col].base_type()
+            original_dtype = df.collect_schema()[col]
+            original_type = original_dtype.base_type()
             if original_type == pl.Null:
                 if verbose:
                     warnings.warn(f"Warning: {col} column is Null data type.")
-            elif original_type != new_type:
+            elif original_type != new_type or (
+                isinstance(new_type, pl.Categorical)
+                and original_dtype.ordering != new_type.ordering
+            ):
                 if original_type == pl.Categorical and new_type in pl.NUMERIC_DTYPES:
                     types.append(pl.col(col).cast(pl.Utf8).cast(new_type))
                 elif new_type == pl.Datetime and original_type != pl.Date:
@@ -529,6 +665,8 @@ def _capitalize(fields: list) -> list:
         "ResponseCountPercentage",
         "ConfigurationName",
         "Configuration",
+        "ValidFrom",
+        "ValidTo",
     ]
     if not isinstance(fields, list):
         fields = [fields]
@@ -655,28 +793,215 @@ def weighted_performance_polars() -> pl.Expr:
 
 
 def overlap_lists_polars(col: pl.Series, row_validity: pl.Series) -> List[float]:
-    """Calculate the overlap of each of the elements (must be a list) with all the others"""
+    """Calculate the overlap of each of the elements (must be a list) with all the others
+
+    The items are encoded as integer ids and every list as a packed bitset, so
+    the pairwise intersections are counted with NumPy instead of Python sets.
+
+    Parameters
+    ----------
+    col : pl.Series
+        A list column, for example the actions per channel
+    row_validity : pl.Series
+        Whether each row should take part in the comparison
+
+    Returns
+    -------
+    List[float]
+        For every valid row, the average number of its items that are also
+        in the other valid rows, relative to its own number of items. NaN for
+        invalid rows, or if there are no other valid rows to compare with.
+    """
     nrows = col.len()
-    average_overlap = []
-    for i in range(nrows):
-        set_i = set(col[i].to_list())
-        overlap_w_other_channels = []
-        for j in range(nrows):
-            if not row_validity[i] or not row_validity[j]:
-                continue
-            if i != j:
-                set_j = set(col[j].to_list())
-                intersection = set_i & set_j
-                overlap_w_other_channels += [len(intersection)]
-        if len(overlap_w_other_channels) > 0:
-            average_overlap += [
-                sum(overlap_w_other_channels)
-                / len(overlap_w_other_channels)
-                / len(set_i)
+    if nrows == 0:
+        return []
+    items = (
+        pl.DataFrame({"Items": col.list.unique()})
+        .with_row_index("Row")
+        .filter(pl.col("Items").list.len() > 0)
+        .explode("Items")
+        .select(
+            "Row",
+            # Nulls are counted as an item of their own, like in a set
+            pl.col("Items").rank("dense").fill_null(0).alias("Item"),
+        )
+    )
+    sizes = col.list.n_unique().fill_null(0).to_numpy()
+    bits = np.zeros((nrows, items["Item"].max() + 1 if len(items) > 0 else 1), bool)
+    bits[items["Row"].to_numpy(), items["Item"].to_numpy()] = True
+    bitsets = np.packbits(bits, axis=1)
+    popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+    valid = row_validity.fill_null(False).to_numpy().astype(bool)
+    others = valid[None, :] & ~np.eye(nrows, dtype=bool)
+    average_overlap = np.full(nrows, np.nan)
+    for i in np.flatnonzero(valid):
+        if sizes[i] == 0 or not others[i].any():
+            continue
+        intersections = popcount[bitsets[i] & bitsets[others[i]]].sum(axis=1)
+        average_overlap[i] = intersections.sum() / len(intersections) / sizes[i]
+    return average_overlap.tolist()
+
+
+def compact_snapshots(
+    df: any_frame,
+    by: List[str] = ["ModelID", "PredictorName", "BinIndex"],
+    snapshots_by: str = "ModelID",
+) -> Tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Compacts a snapshot history into the intervals in which rows did not change.
+
+    Predictor binning snapshots repeat the same bins for every snapshot in
+    which a predictor did not change. This keeps one row per run of
+    identical values instead, with the first and last `SnapshotTime` of that
+    run in `ValidFrom` and `ValidTo`. A run ends when any of the other
+    columns changes, or when the row is missing from the next snapshot of its
+    model. The snapshot times of every model are returned as well, so
+    :func:`expand_snapshots` can restore exactly one row per snapshot.
+
+    Parameters
+    ----------
+    df : Union[pl.DataFrame, pl.LazyFrame]
+        The snapshots, with at most one row per `by` and `SnapshotTime`
+    by : List[str], default = ["ModelID", "PredictorName", "BinIndex"]
+        The columns identifying a row across snapshots
+    snapshots_by : str, default = "ModelID"
+        The column the snapshots are taken for
+
+    Returns
+    -------
+    Tuple[pl.LazyFrame, pl.LazyFrame]
+        The compacted table, with `ValidFrom` and `ValidTo` instead of
+        `SnapshotTime`, and the `snapshots_by` and `SnapshotTime` of all
+        snapshots
+    """
+    df = df.lazy()
+    cols = [col for col in df.collect_schema().names() if col != "SnapshotTime"]
+    values = [col for col in cols if col not in by]
+    snapshots = df.select(snapshots_by, "SnapshotTime").unique()
+    next_snapshot = snapshots.sort("SnapshotTime").with_columns(
+        pl.col("SnapshotTime").shift(-1).over(snapshots_by).alias("NextSnapshot")
+    )
+    changed = [pl.col(col).ne_missing(pl.col(col).shift(1).over(by)) for col in values]
+    compacted = (
+        df.join(next_snapshot, on=[snapshots_by, "SnapshotTime"], how="left")
+        .sort("SnapshotTime")
+        .with_columns(
+            pl.any_horizontal(
+                # Not in the previous snapshot of its model
+                pl.col("NextSnapshot")
+                .shift(1)
+                .over(by)
+                .ne_missing(pl.col("SnapshotTime")),
+                *changed,
+            ).alias("Run")
+        )
+        .with_columns(pl.col("Run").cum_sum().over(by))
+        .group_by(*by, "Run")
+        .agg(
+            pl.col(values).first(),
+            pl.min("SnapshotTime").alias("ValidFrom"),
+            pl.max("SnapshotTime").alias("ValidTo"),
+        )
+        .select(*cols, "ValidFrom", "ValidTo")
+    )
+    return compacted, snapshots
+
+
+def expand_snapshots(
+    df: any_frame,
+    snapshots: Optional[any_frame] = None,
+    snapshots_by: str = "ModelID",
+) -> pl.LazyFrame:
+    """Expands a table compacted with :func:`compact_snapshots` into snapshots.
+
+    Parameters
+    ----------
+    df : Union[pl.DataFrame, pl.LazyFrame]
+        The compacted table, with `ValidFrom` and `ValidTo` columns
+    snapshots : Union[pl.DataFrame, pl.LazyFrame], optional
+        The snapshot times per `snapshots_by`, as returned by
+        :func:`compact_snapshots`. Without them, only the times at which any
+        row of a model started or ended a run are known, so snapshots in
+        which nothing changed are not restored.
+    snapshots_by : str, default = "ModelID"
+        The column the snapshots are taken for
+
+    Returns
+    -------
+    pl.LazyFrame
+        One row per snapshot in which each row was valid, with `SnapshotTime`
+        instead of `ValidFrom` and `ValidTo`
+    """
+    df = df.lazy().drop("SnapshotTime", strict=False)
+    if snapshots is None:
+        snapshots = pl.concat(
+            [
+                df.select(snapshots_by, pl.col(col).alias("SnapshotTime"))
+                for col in ["ValidFrom", "ValidTo"]
             ]
+        ).unique()
+    return (
+        df.join(snapshots.lazy(), on=snapshots_by)
+        .filter(pl.col("SnapshotTime").is_between("ValidFrom", "ValidTo"))
+        .drop("ValidFrom", "ValidTo")
+    )
+
+
+# The blobs that the current thread is looking up the model type of, by digest
+_model_blobs = threading.local()
+
+
+def _model_type(blob: str, chunk_size: int = 2**16) -> str:
+    """Finds the type of model in a base64 encoded, zlib compressed model blob.
+
+    The blob is decoded and inflated in chunks, stopping as soon as the
+    top-level `_serialClass` field is found, instead of decompressing the full,
+    possibly very large, model. The results for the most recently used 4096
+    blobs are cached by the hash of the blob.
+
+    Parameters
+    ----------
+    blob : str
+        The contents of the pyModelData column
+    chunk_size : int, default = 2**16
+        The number of base64 characters to decode at once
+
+    Returns
+    -------
+    str
+        The model class, such as "GbModel"
+    """
+    digest = hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+    _model_blobs.by_digest = {digest: blob}
+    try:
+        return _model_type_by_digest(digest, chunk_size)
+    finally:
+        _model_blobs.by_digest = {}
+
+
+@functools.lru_cache(maxsize=4096)
+def _model_type_by_digest(digest: str, chunk_size: int) -> str:
+    """Parses the blob with this digest, see :func:`_model_type`.
+
+    Only the digest is part of the cache key, so the cache does not hold on
+    to the blobs: the blob itself is passed through `_model_blobs`.
+    """
+    blob = "".join(_model_blobs.by_digest[digest].split())
+    chunk_size -= chunk_size % 4
+    inflater = zlib.decompressobj()
+    remainder = b""
+    for start in range(0, len(blob) + chunk_size, chunk_size):
+        if start < len(blob):
+            data = inflater.decompress(
+                base64.b64decode(blob[start : start + chunk_size])
+            )
         else:
-            average_overlap += [float("nan")]
-    return average_overlap
+            data = inflater.flush() + b"\n"
+        *lines, remainder = (remainder + data).split(b"\n")
+        for line in lines:
+            if line.startswith(b'  "_serialClass"'):
+                return line.split(b'"')[-2].split(b".")[-1].decode()
+    raise ValueError("No _serialClass found in the model data.")
 
 
 def zRatio(
@@ -1050,3 +1375,99 @@ def create_working_and_temp_dir(
         else tempfile.mkdtemp(prefix="tmp_", dir=working_dir)
     )
     return working_dir, Path(temp_dir_name)
+
+
+def _query_cache_key(value):
+    """Turns the arguments of a query into a hashable cache key.
+
+    Polars expressions are keyed by their serialized form. Frames are not
+    keyed, as that would mean hashing their data: a TypeError is raised
+    instead, so the query is not memoized.
+    """
+    if isinstance(value, (pl.DataFrame, pl.LazyFrame, pl.Series)):
+        raise TypeError("Queries on frames are not memoized")
+    if isinstance(value, pl.Expr):
+        return ("Expr", value.meta.serialize())
+    if isinstance(value, dict):
+        return (
+            "dict",
+            tuple(
+                sorted(
+                    ((key, _query_cache_key(val)) for key, val in value.items()),
+                    key=repr,
+                )
+            ),
+        )
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(_query_cache_key(val) for val in value))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_query_cache_key(val) for val in value))
+    hash(value)
+    return value
+
+
+def _copy_query_result(value):
+    """Copies the mutable parts of a memoized query result."""
+    if isinstance(value, pl.DataFrame):
+        return value.clone()
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, tuple):
+        return tuple(_copy_query_result(val) for val in value)
+    return value
+
+
+def memoized_query(method):
+    """Memoizes the results of a query method of the ADMDatamart.
+
+    In the eager import strategy, the (lazy) results of the decorated method
+    are collected once and kept in a least recently used cache on the
+    instance, keyed by the method name, the context keys of the datamart and
+    the arguments. Repeated calls with the same arguments return the
+    materialized result instead of executing the full query again. The cache
+    holds at most
+    `query_cache_size` results and is cleared whenever one of the tables of
+    the datamart is assigned, see
+    :meth:`pdstools.adm.ADMDatamart.clear_query_cache`.
+
+    Only apply this to queries with small, aggregated results. Caching
+    subsets of the full tables would hold on to copies of them, and the
+    queries built on top would lose the predicate pushdown into the scans.
+
+    In the lazy and streaming strategies, results are not memoized, as
+    materializing them would defeat the purpose of those strategies.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self, "import_strategy", None) != "eager":
+            return method(self, *args, **kwargs)
+        try:
+            key = (
+                method.__name__,
+                _query_cache_key(getattr(self, "context_keys", None)),
+                _query_cache_key(args),
+                _query_cache_key(kwargs),
+            )
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        cache = self.__dict__.setdefault("_query_cache", collections.OrderedDict())
+        if key in cache:
+            cache.move_to_end(key)
+            return _copy_query_result(cache[key])
+
+        def materialize(value):
+            if isinstance(value, pl.LazyFrame):
+                return self._collect(value).lazy()
+            if isinstance(value, tuple):
+                return tuple(materialize(val) for val in value)
+            return value
+
+        result = materialize(method(self, *args, **kwargs))
+        cache[key] = result
+        while len(cache) > self.query_cache_size:
+            cache.popitem(last=False)
+        return _copy_query_result(result)
+
+    return wrapper
@@ -5,7 +5,7 @@ class PegaDefaultTables:
     class ADMModelSnapshot:
         pxApplication = pl.Categorical
         pyAppliesToClass = pl.Categorical
-        pyModelID = pl.Utf8
+        pyModelID = pl.Categorical("lexical")  # sorts like the strings
         pyConfigurationName = pl.Categorical
         pySnapshotTime = pl.Datetime
         pyIssue = pl.Categorical
@@ -41,12 +41,12 @@ class PegaDefaultTables:
     class ADMPredictorBinningSnapshot:
         pxCommitDateTime = pl.Datetime
         pxSaveDateTime = pl.Datetime
-        pyModelID = pl.Utf8
+        pyModelID = pl.Categorical("lexical")  # sorts like the strings
         pxObjClass = pl.Categorical
         pzInsKey = pl.Utf8
         pxInsName = pl.Utf8
         pyPredictorName = pl.Categorical
-        pyContents = pl.Utf8
+        pyContents = pl.Categorical
         pyPerformance = pl.Float64
         pyPositives = pl.Float32
         pyNegatives = pl.Float32
@@ -61,7 +61,7 @@ class PegaDefaultTables:
         pyBinType = pl.Categorical
         pyBinNegativesPercentage = pl.Float32
         pyBinPositivesPercentage = pl.Float32
-        pyBinSymbol = pl.Utf8
+        pyBinSymbol = pl.Categorical
         pyBinLowerBound = pl.Float32
         pyBinUpperBound = pl.Float32
         pyRelativeBinPositives = pl.Float32
@@ -71,12 +71,14 @@ class PegaDefaultTables:
         pyBinResponseCountPercentage = pl.Float32
         pySnapshotTime = pl.Datetime
         pyBinIndex = pl.UInt16
-        pyLift = pl.Float64
-        pyZRatio = pl.Float64
+        pyLift = pl.Float32
+        pyZRatio = pl.Float32
         pyEntryType = pl.Categorical
         pyExtension = pl.Utf8
-        pyGroupIndex = pl.UInt32
+        pyGroupIndex = pl.UInt16
         pyCorrelationPredictor = pl.Float32
+        pyValidFrom = pl.Datetime
+        pyValidTo = pl.Datetime
 
     class pyValueFinder:
         pyDirection = pl.Categorical
@@ -9,12 +9,11 @@ import polars as pl
 from polars.testing import assert_frame_equal
 from polars.exceptions import ComputeError, InvalidOperationError, ColumnNotFoundError
 import itertools
-from pandas.errors import UndefinedVariableError
 import pathlib
 
 basePath = pathlib.Path(__file__).parent.parent.parent
 sys.path.append(f"{str(basePath)}/python")
-from pdstools import ADMDatamart, cdh_utils
+from pdstools import ADMDatamart, cdh_utils, pega_io
 from pdstools import errors
 
 
@@ -212,6 +211,8 @@ def test_apply_query(test, data):
         test._apply_query(data, query={"pymodelid": mods}),
         # with pandas query
         test._apply_query(data, query=f"pymodelid.isin({mods})"),
+        # with SQL query
+        test._apply_query(data, query="pymodelid IN ('model1', 'model2')"),
     ]
 
     [
@@ -225,8 +226,8 @@ def test_apply_query(test, data):
     with pytest.raises(ValueError):
         test._apply_query(data, query={"Channel": "Email"})
 
-    with pytest.raises(UndefinedVariableError):
-        test._apply_query(data, query="UnknownCol>0").collect()
+    with pytest.raises(ColumnNotFoundError):
+        test._apply_query(data, query="UnknownCol>0")
 
 
 def test_set_types(test):
@@ -356,23 +357,34 @@ def test_lazy_strategy():
     pass
 
 
+def test_lazy_extract_keys():
+    kwargs = dict(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename=None,
+        extract_keys=True,
+    )
+    eager = ADMDatamart(**kwargs).modelData.collect()
+    for strategy in ["lazy", "streaming"]:
+        lazy = ADMDatamart(**kwargs, import_strategy=strategy).modelData
+        assert isinstance(lazy, pl.LazyFrame)
+        assert_frame_equal(lazy.collect(), eager)
+
+
+def test_string_query_in_lazy():
+    lazyADM = ADMDatamart(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+        import_strategy="lazy",
+        query="Channel=='Web'",
+    )
+    assert isinstance(lazyADM.modelData, pl.LazyFrame)
+    channels = lazyADM.modelData.select(pl.col("Channel").unique()).collect()
+    assert channels.item() == "Web"
+
+
 def test_eagerFunctionalityFailsInLazy(test):
-    with pytest.raises(errors.NotEagerError):
-        ADMDatamart(
-            path=f"{basePath}/data",
-            model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
-            predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
-            import_strategy="lazy",
-            extract_keys=True,
-        )
-    with pytest.raises(errors.NotEagerError):
-        ADMDatamart(
-            path=f"{basePath}/data",
-            model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
-            predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
-            import_strategy="lazy",
-            query="Channel=='Web'",
-        )
     lazyADM = ADMDatamart(
         path=f"{basePath}/data",
         model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
@@ -387,6 +399,218 @@ def test_eagerFunctionalityFailsInLazy(test):
         lazyADM.pivot_df(lazyADM.modelData, allow_collect=False)
 
 
+def test_streaming_strategy(test, tmp_path):
+    streaming = ADMDatamart(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+        import_strategy="streaming",
+    )
+    assert streaming.hasMultipleSnapshots
+    assert streaming.get_model_stats()["models_total"] == 68
+    assert_frame_equal(
+        streaming.pivot_df(streaming.combinedData), test.pivot_df(test.combinedData)
+    )
+    with pytest.raises(errors.NotEagerError):
+        streaming.pivot_df(streaming.combinedData, allow_collect=False)
+    model_file, _ = streaming.save_data(tmp_path)
+    assert pl.read_ipc(model_file).height == test.modelData.collect().height
+
+
+def test_deferred_combined_data(test):
+    assert "combinedData" not in test.__dict__
+    assert "hasMultipleSnapshots" not in test.__dict__
+    assert test.hasMultipleSnapshots
+    assert test.combinedData.collect().height == 4576
+    assert "combinedData" in test.__dict__
+
+    test.applyGlobalQuery(pl.col("Channel") == "Web")
+    assert "combinedData" not in test.__dict__
+    assert (
+        test.combinedData.select(pl.col("Channel").unique()).collect().item() == "Web"
+    )
+
+
+def test_memoized_queries(test):
+    web = test.model_summary(query=pl.col("Channel") == "Web").collect()
+    assert_frame_equal(
+        test.model_summary(query=pl.col("Channel") == "Web").collect(), web
+    )
+    test.model_summary(query=pl.col("Channel") == "Email")
+    assert len(test._query_cache) == 2
+    test._subset_data("modelData", {"Performance"})
+    assert len(test._query_cache) == 2
+
+    test.query_cache_size = 1
+    test.last("modelData")
+    assert list(test._query_cache)[0][0] == "last"
+
+    test.applyGlobalQuery(pl.col("Channel") == "Web")
+    assert "_query_cache" not in test.__dict__
+    assert_frame_equal(test.model_summary().collect(), web, check_row_order=False)
+
+    test.context_keys = ["Channel"]
+    assert test.model_summary().collect().width < web.width
+
+    # Assigning a table directly also invalidates the memoized results
+    n_models = test.last("modelData").height
+    test.modelData = test.modelData.filter(pl.col("Channel") != "Web")
+    assert test.last("modelData").height < n_models
+
+
+def test_interned_model_ids(test):
+    models = test.modelData.select("ModelID").unique().collect()
+    preds = test.predictorData.select("ModelID").unique().collect()
+    assert models.schema["ModelID"] == preds.schema["ModelID"] == pl.Categorical
+    joined = models.join(preds, on="ModelID")
+    assert joined.height == preds.height
+    assert joined.select(pl.col("ModelID").to_physical()).dtypes == [pl.UInt32]
+    model_id = models.get_column("ModelID").cast(pl.Utf8)[0]
+    assert test.modelData.filter(pl.col("ModelID") == model_id).collect().height > 0
+
+    # Sorting on ModelID still gives the order of the strings
+    ids = test.predictorData.select("ModelID").collect().get_column("ModelID")
+    assert ids.sort().cast(pl.Utf8).to_list() == ids.cast(pl.Utf8).sort().to_list()
+    physical = test.modelData.with_columns(pl.col("ModelID").cast(pl.Categorical))
+    assert physical.collect_schema()["ModelID"].ordering == "physical"
+    retyped = ADMDatamart(model_df=physical).modelData
+    assert retyped.collect_schema()["ModelID"].ordering == "lexical"
+
+
+def test_compact_predictor_binning(test):
+    schema = test.predictorData.collect_schema()
+    for col in ["PredictorName", "BinSymbol", "Type", "EntryType", "BinType"]:
+        assert schema[col] == pl.Categorical
+    assert schema["BinIndex"] == pl.UInt16
+    df, _ = test._subset_data("predictorData", {"PredictorName", "BinSymbol"})
+    assert df.collect_schema()["BinSymbol"] == pl.Categorical
+
+    # The data returned by the plots has string columns
+    bubbles = test.plotPerformanceSuccessRateBubbleChart(return_df=True)
+    for col in ["ModelID", "Issue", "Channel", "Group"]:
+        assert bubbles.schema[col] == pl.Utf8
+    model_id = test.predictorData.select("ModelID").collect().item(0, 0)
+    binning = test.plotPredictorBinning(modelids=[model_id], return_df=True)
+    assert binning.schema["BinSymbol"] == binning.schema["PredictorName"] == pl.Utf8
+
+
+def test_health_check_data(test, tmp_path):
+    data = test.health_check_data()
+    assert set(data) == {
+        "last_data",
+        "channel_overview",
+        "action_overview",
+        "configuration_overview",
+        *ADMDatamart.health_check_predictor_aggregates,
+    }
+    assert data["last_data"].height == 68
+    actions = data["action_overview"].row(0, named=True)
+    assert actions["Number"] == test.modelData.select(
+        pl.col("Name").n_unique()
+    ).collect().item()
+    assert len(actions["Values"]) == 6
+    assert data["predictor_performance"].height == test.predictorData.filter(
+        pl.col("PredictorName") != "Classifier"
+    ).select(pl.col("PredictorName").n_unique()).collect().item()
+
+    directory = test.save_health_check_data(tmp_path)
+    for name, df in ADMDatamart.read_health_check_data(directory).items():
+        assert_frame_equal(df, data[name], check_dtypes=False)
+
+
+def test_health_check_data_after_exclusions(test):
+    # Like the report, which leaves out unused channels after filling
+    channel = test.modelData.select(pl.first("Channel")).collect().item()
+    filtered = ADMDatamart(
+        model_df=test.modelData.filter(pl.col("Channel") != channel),
+        predictor_df=test.predictorData,
+    )
+    data = filtered.health_check_data(
+        ["predictors_per_configuration", "propensity_distribution"],
+        fill_missing=False,
+    )
+    channels = data["propensity_distribution"].get_column("Channel")
+    assert channels.len() > 0 and channel not in channels
+    used_in = data["predictors_per_configuration"].get_column("Used in (Channels)")
+    assert channel not in used_in.explode()
+
+
+def test_health_check_data_cache(test, tmp_path):
+    test.cache_dir = tmp_path
+    data = test.health_check_data()
+    cached = {file.name for file in (tmp_path / "health_check").glob("*.parquet")}
+    assert len(cached) == len(data)
+    for name, df in test.health_check_data().items():
+        assert_frame_equal(df, data[name])
+
+    # New responses do not change the actions, so only that aggregate is reused
+    test.modelData = test.modelData.with_columns(pl.col("ResponseCount") + 1)
+    test.health_check_data()
+    recached = {file.name for file in (tmp_path / "health_check").glob("*.parquet")}
+    assert len(recached) == len(data)
+    assert cached & recached == {
+        file for file in cached if file.startswith("action_overview_")
+    }
+
+    # New predictor data only changes the predictor aggregates
+    test.predictorData = test.predictorData.filter(pl.col("BinIndex") > 1)
+    test.health_check_data()
+    predictors = {
+        file.name for file in (tmp_path / "health_check").glob("*.parquet")
+    }
+    assert {file.rsplit("_", 1)[0] for file in predictors - recached} == set(
+        ADMDatamart.health_check_predictor_aggregates
+    )
+
+
+def test_compact_predictor_data(tmp_path):
+    kwargs = dict(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+    )
+    ref = ADMDatamart(**kwargs)
+    dm = ADMDatamart(**kwargs).compact_predictor_data()
+    assert {"ValidFrom", "ValidTo"}.issubset(dm.predictorData.collect_schema().names())
+    assert (
+        dm.predictorData.select(pl.len()).collect().item()
+        < ref.predictorData.select(pl.len()).collect().item()
+    )
+
+    keys = ["ModelID", "PredictorName", "BinIndex"]
+    expected = ref.last("predictorData").sort(keys)
+    assert_frame_equal(
+        dm.last("predictorData").select(expected.columns).sort(keys),
+        expected,
+        categorical_as_str=True,
+    )
+    assert dm.plotPredictorPerformance(last=False) is not None
+
+    # Plots over all snapshots see exactly the original snapshots
+    expanded, _ = dm._subset_data("predictorData", set(expected.columns))
+    assert_frame_equal(
+        expanded.select(expected.columns).sort(*keys, "SnapshotTime").collect(),
+        ref.predictorData.select(expected.columns)
+        .sort(*keys, "SnapshotTime")
+        .collect(),
+        categorical_as_str=True,
+    )
+
+    _, predictor_file = dm.save_data(tmp_path)
+    compacted = ADMDatamart(
+        path=tmp_path,
+        model_filename=None,
+        predictor_filename=pathlib.Path(predictor_file).name,
+        include_cols=["ValidFrom", "ValidTo"],
+    )
+    assert_frame_equal(
+        compacted.last("predictorData").select(expected.columns).sort(keys),
+        expected,
+        categorical_as_str=True,
+        check_dtypes=False,
+    )
+
+
 def test_explicit_plotting_engine(test):
     from pdstools.plots.plots_plotly import ADMVisualisations as plotly
 
@@ -415,6 +639,39 @@ def test_save_data(test):
         print("Could not remove file: ", e)
 
 
+def test_save_data_partitioned(test, tmp_path):
+    model_path, predictor_path = test.save_data(tmp_path, partitioned=True)
+    assert (
+        pathlib.Path(model_path)
+        / "Configuration=OmniAdaptiveModel"
+        / "SnapshotDate=2021-06-01"
+    ).is_dir()
+    imported = ADMDatamart(tmp_path)
+    assert_frame_equal(
+        imported.modelData.sort("ModelID", "SnapshotTime"),
+        test.modelData.sort("ModelID", "SnapshotTime"),
+        check_column_order=False,
+    )
+    assert "Configuration" in imported.predictorData.collect_schema().names()
+    schema = pega_io.readDSExport(model_path).collect_schema()
+    assert schema["Configuration"] == pl.Categorical
+    assert "SnapshotDate" not in schema
+
+    queried = ADMDatamart(tmp_path, query={"Configuration": ["NotAConfiguration"]})
+    assert queried.modelData.collect().height == 0
+    assert queried.predictorData.collect().height == 0
+
+
+def test_save_data_partitioned_without_snapshots(test, tmp_path):
+    test.modelData = test.modelData.with_columns(
+        SnapshotTime=pl.lit(None, dtype=pl.Datetime)
+    )
+    model_path, _ = test.save_data(tmp_path, partitioned=True)
+    partition = pathlib.Path(model_path) / "Configuration=OmniAdaptiveModel"
+    assert partition.is_dir()
+    assert not any(path.is_dir() for path in partition.iterdir())
+
+
 @pytest.fixture
 def sample_with_agb():
     return ADMDatamart(
@@ -542,3 +799,22 @@ def test_extract_keys_on_empty_df(test):
     """Testing that an empty dataframe doesn't fail hard"""
     filtered_df = test.modelData.filter(pl.col("Name") == "TEST")
     ADMDatamart(model_df=filtered_df, extract_keys=True).modelData.collect()
+
+
+def test_import_cache(tmp_path, test):
+    kwargs = dict(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+        cache_dir=tmp_path,
+    )
+    first = ADMDatamart(**kwargs)
+    assert len(list(tmp_path.glob("*.arrow"))) == 2
+    cached = ADMDatamart(**kwargs)
+    assert len(list(tmp_path.glob("*.arrow"))) == 2
+    assert cached.missing_model == first.missing_model
+    assert_frame_equal(cached.modelData, test.modelData)
+    assert_frame_equal(cached.predictorData, test.predictorData)
+
+    ADMDatamart(**kwargs, extract_keys=True)
+    assert len(list(tmp_path.glob("*.arrow"))) == 3
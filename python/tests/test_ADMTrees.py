@@ -2,13 +2,16 @@
 Testing the functionality of the ADMDatamart functions
 """
 
+import datetime
 import pytest
 import sys
 
 import pathlib
+import polars as pl
 basePath = pathlib.Path(__file__).parent.parent.parent
 sys.path.append(f"{str(basePath)}/python")
 from pdstools import ADMTrees
+from pdstools.adm.ADMTrees import ADMTreesModel
 
 
 @pytest.fixture
@@ -79,3 +82,258 @@ def test_plotContributionPerTree(treeSample, sampledX):
 
 def test_plotSplitsPerVariableType(treeSample):
     treeSample.plotSplitsPerVariableType()
+
+
+def test_score_batch(treeSample):
+    samples = [sampleX(treeSample) for _ in range(20)]
+    scores = treeSample.score_batch(pl.DataFrame(samples), chunk_size=7)
+    assert len(scores) == 20
+    for x, score in zip(samples, scores):
+        assert score == pytest.approx(treeSample.score(x))
+
+
+def test_compiledTrees(treeSample):
+    compiled = treeSample.compiledTrees
+    assert len(compiled) == len(treeSample.model)
+    assert compiled.score[compiled.roots[0]] == treeSample.model[0]["score"]
+    assert (compiled.left[compiled.split_kind == compiled.LEAF] == -1).all()
+
+
+@pytest.fixture
+def encodedSample():
+    """A minimal encoded model, as found in the datamart's Modeldata column."""
+    import base64
+    import json
+    import zlib
+
+    model = {
+        "_serialClass": "com.pega.decision.adm.client.gb.GbModel",
+        "configuration": {
+            "parameters": {"learningRateEta": 0.3},
+            "contextKeys": [],
+            "predictors": [
+                {"name": "Age", "type": "numeric"},
+                {"name": "Color", "type": "symbolic"},
+            ],
+        },
+        "model": {
+            "inputsEncoder": {
+                "encoders": [
+                    {
+                        "key": "Age",
+                        "value": {
+                            "index": 0,
+                            "encoder": {
+                                "quantileArray": {
+                                    "summaryType": "INITIAL_SUMMARY",
+                                    "summary": {"initialValues": [10, 20, 30, 40]},
+                                }
+                            },
+                        },
+                    },
+                    {
+                        "key": "Color",
+                        "value": {
+                            "index": 1,
+                            "encoder": {
+                                "stringTranslator": {
+                                    "symbols": ["green=2", "Missing=0", "red=1", "blue=3"]
+                                }
+                            },
+                        },
+                    },
+                ]
+            },
+            "boosters": [
+                {
+                    "trees": [
+                        {
+                            "score": 0.1,
+                            "gain": 1.0,
+                            "split": "0 LT 2",
+                            "left": {"score": 0.2},
+                            "right": {
+                                "score": -0.1,
+                                "gain": 0.5,
+                                "split": "1 LT 132",
+                                "left": {
+                                    "score": 0.3,
+                                    "gain": 0.2,
+                                    "split": "1 LT 129",
+                                    "left": {"score": 0.4},
+                                    "right": {"score": 0.1},
+                                },
+                                "right": {
+                                    "score": -0.2,
+                                    "gain": 0.1,
+                                    "split": "1 EQ 132",
+                                    "left": {"score": -0.3},
+                                    "right": {"score": -0.1},
+                                },
+                            },
+                        }
+                    ]
+                }
+            ],
+        },
+    }
+    return base64.b64encode(zlib.compress(json.dumps(model).encode())).decode()
+
+
+def test_decode_splits(encodedSample):
+    trees = ADMTrees(encodedSample)
+    tree = trees.model[0]
+    assert tree["split"] == "Age < 30"
+    assert tree["right"]["split"] == "Color in { Missing, red, green }"
+    assert tree["right"]["left"]["split"] == "Color is Missing"
+    assert tree["right"]["right"]["split"] == "Color in { blue }"
+
+
+@pytest.fixture
+def snapshots(encodedSample):
+    """Three datamart snapshots of the same encoded model."""
+    return pl.DataFrame(
+        {
+            "Configuration": ["AGB", "AGB", "AGB"],
+            "SnapshotTime": [datetime.datetime(2024, 1, day) for day in (1, 2, 3)],
+            "Modeldata": [encodedSample] * 3,
+        }
+    )
+
+
+def test_multitrees_decode_on_access(snapshots):
+    import warnings
+
+    from pdstools import MultiTrees
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        multi = ADMTrees(snapshots, verbose=False, cache_size=1)["AGB"]
+    assert isinstance(multi, MultiTrees)
+    with pytest.warns(DeprecationWarning, match="n_threads"):
+        ADMTrees(snapshots, n_threads=4, verbose=False)
+    assert len(multi) == 3
+    assert all(isinstance(blob, bytes) for blob in multi.trees.values())
+
+    timestamp, model = multi.first
+    assert timestamp == "2024-01-01 00:00:00"
+    assert model.model[0]["split"] == "Age < 30"
+    assert multi[timestamp] is model
+    multi.last
+    assert list(multi._cache.keys()) == ["2024-01-03 00:00:00"]
+
+    overTime = multi.computeOverTime()
+    assert overTime.get_column("SnapshotTime").n_unique() == 3
+    assert len(multi._cache) == 1
+
+
+def test_multitrees_shares_identical_trees(snapshots):
+    multi = ADMTrees(snapshots, verbose=False, cache_size=1)["AGB"]
+    overTime = multi.computeOverTime()
+    assert len(multi.store) == 1
+    hashes = [multi.getTreeHashes(timestamp) for timestamp in multi.trees]
+    assert hashes[0] == hashes[1] == hashes[2]
+    first, last = multi.first[1], multi.last[1]
+    assert first is not last
+    assert first.model[0] is last.model[0]
+    expected = first.splitsPerVariableType[0]
+    assert overTime.drop("SnapshotTime").row(0, named=True) == dict(expected[0])
+
+
+def test_multitrees_store_releases_trees(snapshots):
+    import gc
+
+    multi = ADMTrees(snapshots, verbose=False, cache_size=1)["AGB"]
+    overTime = multi.computeOverTime()
+    assert len(multi.store) == 1
+    multi._cache.clear()
+    gc.collect()
+    assert len(multi.store) == 0
+    assert multi.computeOverTime().equals(overTime)
+    assert len(multi.store) == 1
+
+
+def test_save_and_load(encodedSample, tmp_path):
+    model = ADMTrees(encodedSample)
+    model.save(tmp_path)
+    loaded = ADMTreesModel.load(tmp_path)
+    assert "_model" not in loaded.__dict__
+    assert loaded.trees is None
+    assert not hasattr(loaded, "notAnAttribute")
+    assert "_model" not in loaded.__dict__
+    assert loaded.properties == model.properties
+    assert loaded.encoders.keys() == model.encoders.keys()
+
+    df = pl.DataFrame({"Age": [15, 35, None], "Color": ["red", "blue", None]})
+    assert loaded.score_batch(df).to_list() == model.score_batch(df).to_list()
+    assert loaded.model == model.model
+
+
+def test_nodeTable(encodedSample):
+    model = ADMTrees(encodedSample)
+    nodes = model.nodeTable
+    assert nodes.get_column("node_id").to_list() == list(range(1, 10))
+    assert nodes.get_column("parent").to_list() == [None, 1, 1, 3, 4, 4, 3, 7, 7]
+    assert nodes.row(2, named=True)["value"] == ["Missing", "green", "red"]
+    assert nodes.row(3, named=True)["sign"] == "is"
+
+    stats = model.treeStats.row(0, named=True)
+    assert stats["depth"] == 3
+    assert stats["nsplits"] == 4
+    assert stats["gains"] == [1.0, 0.5, 0.2, 0.1]
+    assert model.splitsPerTree[0][0] == "Age < 30"
+    assert model.groupedGainsPerSplit.get_column("n").to_list() == [1, 1, 1, 1]
+    assert model.allValuesPerSplit["Color"] == {"Missing", "green", "red", "blue"}
+
+
+def test_explain_batch(encodedSample):
+    model = ADMTrees(encodedSample)
+    df = pl.DataFrame({"Age": [15, 35], "Color": ["blue", "red"]})
+    leafScores, contributions = model.explain_batch(df)
+    assert leafScores.get_column("0").to_list() == [0.2, 0.1]
+    assert contributions.columns == ["Bias", "Age", "Color"]
+    assert contributions.row(0) == pytest.approx((0.1, 0.1, 0.0))
+    assert contributions.row(1) == pytest.approx((0.1, -0.2, 0.2))
+
+
+def test_evaluate_hds(encodedSample, tmp_path):
+    model = ADMTrees(encodedSample)
+    pl.DataFrame(
+        {
+            "Age": [15, 15, 35, 35, 35],
+            "Color": ["red", "red", "blue", "Missing", None],
+            "Decision_Outcome": [
+                "Accepted",
+                "Rejected",
+                "Rejected",
+                "Accepted",
+                "Other",
+            ],
+        }
+    ).write_ndjson(tmp_path / "hds.json")
+
+    results = model.evaluate_hds(str(tmp_path / "hds.json"), chunk_size=2, n_workers=1)
+    assert results["ResponseCount"] == 4
+    assert results["Positives"] == 2
+    assert results["AUC"] == pytest.approx(0.875)
+    calibration = results["Calibration"]
+    assert calibration.get_column("ResponseCount").sum() == 4
+
+
+def test_evaluate_hds_workers(encodedSample, tmp_path):
+    model = ADMTrees(encodedSample)
+    pl.DataFrame(
+        {
+            "Age": [15, 15, 35, 35],
+            "Color": ["red", "red", "blue", "Missing"],
+            "Decision_Outcome": ["Accepted", "Rejected", "Rejected", "Clicked"],
+        }
+    ).write_ndjson(tmp_path / "hds.json")
+
+    file = str(tmp_path / "hds.json")
+    expected = model.evaluate_hds(file, chunk_size=2, n_workers=1)
+    results = model.evaluate_hds(file, chunk_size=2, n_workers=2)
+    assert results["ResponseCount"] == expected["ResponseCount"] == 4
+    assert results["Positives"] == expected["Positives"] == 2
+    assert results["AUC"] == pytest.approx(expected["AUC"])
+    assert results["Calibration"].equals(expected["Calibration"])
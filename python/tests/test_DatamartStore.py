@@ -0,0 +1,90 @@
+"""
+Testing the functionality of the DatamartStore
+"""
+
+import sys
+import shutil
+import pathlib
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+basePath = pathlib.Path(__file__).parent.parent.parent
+sys.path.append(f"{str(basePath)}/python")
+from pdstools import ADMDatamart, DatamartStore, pega_io
+
+model_file = "Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip"
+predictor_file = "Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip"
+
+
+def test_incremental_update(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    raw = pega_io.readDSExport(model_file, f"{basePath}/data").collect()
+    cutoff = raw.get_column("SnapshotTime").sort()[len(raw) // 2]
+    raw.filter(pl.col("SnapshotTime") < cutoff).write_parquet(
+        exports / "Data-Decision-ADM-ModelSnapshot_1.parquet"
+    )
+    shutil.copy(f"{basePath}/data/{predictor_file}", exports)
+
+    store = DatamartStore(tmp_path / "store")
+    assert store.update(exports) == {
+        "modelData": ["Data-Decision-ADM-ModelSnapshot_1.parquet"],
+        "predictorData": [predictor_file],
+    }
+    raw.filter(pl.col("SnapshotTime") >= cutoff).write_parquet(
+        exports / "Data-Decision-ADM-ModelSnapshot_2.parquet"
+    )
+    assert store.update(exports) == {
+        "modelData": ["Data-Decision-ADM-ModelSnapshot_2.parquet"],
+        "predictorData": [],
+    }
+    assert store.update(exports) == {"modelData": [], "predictorData": []}
+
+    dm = store.to_datamart()
+    ref = ADMDatamart(
+        f"{basePath}/data",
+        model_filename=model_file,
+        predictor_filename=predictor_file,
+    )
+    assert dm.modelData.collect().height == ref.modelData.collect().height
+    assert dm.predictorData.collect().height == ref.predictorData.collect().height
+
+    expected = (
+        ref.modelData.sort("SnapshotTime")
+        .with_columns(
+            ADMDatamart._last_timestamp("Positives"),
+            ADMDatamart._last_timestamp("ResponseCount"),
+        )
+        .sort("ModelID", "SnapshotTime")
+        .collect()
+    )
+    assert_frame_equal(
+        dm.modelData.select(expected.columns).sort("ModelID", "SnapshotTime").collect(),
+        expected,
+        check_dtypes=False,
+    )
+
+
+def test_overlapping_update(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    raw = pega_io.readDSExport(model_file, f"{basePath}/data").collect()
+    cutoff = raw.get_column("SnapshotTime").sort()[len(raw) // 2]
+    raw.filter(pl.col("SnapshotTime") < cutoff).write_parquet(
+        exports / "Data-Decision-ADM-ModelSnapshot_1.parquet"
+    )
+    store = DatamartStore(tmp_path / "store")
+    store.update(exports)
+    # A full re-export, which includes the snapshots of the first export
+    raw.write_parquet(exports / "Data-Decision-ADM-ModelSnapshot_2.parquet")
+    assert store.update(exports)["modelData"] == [
+        "Data-Decision-ADM-ModelSnapshot_2.parquet"
+    ]
+
+    modelData = store.scan("modelData").collect()
+    assert "SnapshotDate" not in modelData.columns
+    assert modelData.height == raw.height
+    assert modelData.select("ModelID", "SnapshotTime").is_duplicated().sum() == 0
+    last = pl.read_parquet(tmp_path / "store" / "Last.parquet")
+    assert last.height == raw.get_column("ModelID").n_unique()
@@ -279,3 +279,14 @@ def test_cache_to_file():
     )
     for file in [cached_path_parquet, cached_path_arrow]:
         os.remove(file)
+
+
+def test_readHDSChunks():
+    chunks = list(pega_io.readHDSChunks(f"{basePath}/data/SampleHDS.json", 3))
+    assert [chunk.height for chunk in chunks] == [3, 3, 1]
+    assert "Decision_Outcome" in chunks[0].columns
+
+    records = sum(
+        chunk.height for chunk in pega_io.readHDSChunks(f"{basePath}/data/hds.zip")
+    )
+    assert records == 12062
@@ -221,6 +221,53 @@ def test_overlap_lists_polars_more():
         )
 
 
+def test_overlap_lists_polars_categorical():
+    actions = pl.Series(
+        [["a", "b", "b"], ["b", "c"], [], ["a", None]],
+        dtype=pl.List(pl.Categorical),
+    )
+    results = cdh_utils.overlap_lists_polars(actions, pl.Series([True] * 4))
+    assert results[:2] == [2.0 / 3 / 2, 1.0 / 3 / 2]
+    assert np.isnan(results[2])
+    assert results[3] == 1.0 / 3 / 2
+
+
+def test_compact_snapshots():
+    t1, t2, t3 = [datetime.datetime(2024, 1, day) for day in [1, 2, 3]]
+    snapshots = pl.DataFrame(
+        {
+            "ModelID": ["m1", "m1", "m1", "m1", "m1", "m2", "m2", "m2"],
+            "PredictorName": ["p"] * 8,
+            "BinIndex": [1, 1, 1, 2, 2, 1, 1, 1],
+            "BinPositives": [1, 1, 2, 5, 5, 7, 7, 7],
+            "SnapshotTime": [t1, t2, t3, t1, t3, t1, t2, t3],
+        }
+    )
+    compacted, times = cdh_utils.compact_snapshots(snapshots)
+    compacted = compacted.collect()
+    assert compacted.sort("ModelID", "BinIndex", "ValidFrom").to_dicts() == [
+        # Bin 2 is not in the second snapshot, so it has two runs
+        dict(zip(compacted.columns, row))
+        for row in [
+            ("m1", "p", 1, 1, t1, t2),
+            ("m1", "p", 1, 2, t3, t3),
+            ("m1", "p", 2, 5, t1, t1),
+            ("m1", "p", 2, 5, t3, t3),
+            ("m2", "p", 1, 7, t1, t3),
+        ]
+    ]
+    keys = ["ModelID", "BinIndex", "SnapshotTime"]
+    expanded = cdh_utils.expand_snapshots(compacted, times).collect()
+    assert expanded.sort(keys).equals(snapshots.sort(keys))
+
+    # Without the snapshot times, the second snapshot of m2 is not restored
+    expanded = cdh_utils.expand_snapshots(compacted).collect()
+    assert expanded.sort(keys).equals(
+        snapshots.filter((pl.col("ModelID") == "m1") | (pl.col("SnapshotTime") != t2))
+        .sort(keys)
+    )
+
+
 def test_weighted_performance_polars():
     input = pl.DataFrame(
         {
@@ -548,3 +595,57 @@ def test_legend_color_order():
     output_fig = cdh_utils.legend_color_order(input_fig)
 
     assert output_fig.data[0].marker.color == "#001F5F"
+
+
+def test_query_to_expr():
+    df = pl.DataFrame(
+        {
+            "Channel": ["Web", "Email", "Web", None],
+            "Positives": [1, 20, 30, 40],
+            "Name": ["GoldCard", "SilverCard", "Loan", "GoldLoan"],
+        },
+        schema_overrides={"Channel": pl.Categorical},
+    )
+    queries = {
+        "Channel == 'Web' and Positives > 10": [30],
+        "(Channel == 'Web') & ~(Positives < 10)": [30],
+        "Channel in ['Web', 'Email'] or Channel.isna()": [1, 20, 30, 40],
+        "Channel.isin(('Email',)) | (10 <= Positives * 2 < 50)": [20],
+        "Name.str.startswith('Gold') and Name.str.contains('Loan')": [40],
+        "Channel = 'Web' AND Positives BETWEEN 10 AND 30": [30],
+        "Channel NOT IN ('Web') OR Positives = 1": [1, 20],
+        # `&` and `|` bind like `and` and `or`, as in pandas
+        "Positives > 5 & Positives < 25": [20],
+        "Channel == 'Web' & Positives > 10": [30],
+        "Positives < 5 | Positives > 35 & Channel.isna()": [1, 40],
+        "Name == 'A&B' | Positives == 1": [1],
+    }
+    for query, expected in queries.items():
+        result = df.filter(cdh_utils._query_to_expr(query))
+        assert result["Positives"].to_list() == expected, query
+
+    with pytest.raises(ValueError):
+        cdh_utils._query_to_expr("Name.str.lower() == 'loan'")
+
+
+def test_model_type():
+    import base64
+    import zlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    model = b'{\n  "_serialClass" : "com.pega.decision.adm.client.GbModel",\n'
+    model += b'  "trees" : [ ]\n}' * 1000
+    blob = base64.b64encode(zlib.compress(model)).decode()
+    assert cdh_utils._model_type(blob, chunk_size=64) == "GbModel"
+    assert cdh_utils._model_type(blob) == "GbModel"
+    hits = cdh_utils._model_type_by_digest.cache_info().hits
+    assert cdh_utils._model_type(blob) == "GbModel"
+    assert cdh_utils._model_type_by_digest.cache_info().hits == hits + 1
+
+    cdh_utils._model_type_by_digest.cache_clear()
+    with ThreadPoolExecutor(4) as pool:
+        assert set(pool.map(cdh_utils._model_type, [blob] * 16)) == {"GbModel"}
+
+    blob = base64.b64encode(zlib.compress(b'{\n    "_serialClass" : "x"\n}')).decode()
+    with pytest.raises(ValueError):
+        cdh_utils._model_type(blob)
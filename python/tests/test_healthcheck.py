@@ -111,3 +111,144 @@ def test_GenerateModelReport_Failing(sample_without_predictorbinning):
         "model_list argument is None, not a list, or contains non-string elements for generate_model_reports. Please provide a list of model_id strings to generate reports."
         in str(e_info)
     )
+
+
+def test_GenerateModelReports_parallel(sample_without_predictorbinning, tmp_path):
+    import zipfile
+
+    import yaml
+
+    dm = sample_without_predictorbinning
+    rendered = []
+
+    def fake_render(temp_dir, qmd_file, output_type, output_filename, **kwargs):
+        with open(temp_dir / "params.yaml") as f:
+            params = yaml.safe_load(f)["kwargs"]
+        assert any(pathlib.Path(params["path"]).glob("cached_modelData*"))
+        assert output_filename.endswith(f"_{params['model_id']}.html")
+        assert not kwargs["verbose"]
+        rendered.append(temp_dir.name)
+        (temp_dir / output_filename).write_text(params["model_id"])
+
+    dm._run_quarto_command = fake_render
+    progress = []
+    model_list = dm.modelData.select("ModelID").unique().collect()["ModelID"]
+    model_list = model_list.cast(str).to_list()[:6]
+    report = dm.generate_model_reports(
+        name="MyOrg",
+        model_list=model_list + model_list[:2],
+        working_dir=tmp_path,
+        progress_callback=lambda current, total: progress.append((current, total)),
+        n_workers=3,
+    )
+    with zipfile.ZipFile(report) as zip:
+        assert len(zip.namelist()) == 6
+    assert progress == [(i, 6) for i in range(1, 7)]
+    assert set(rendered) <= {"worker_0", "worker_1", "worker_2"}
+    assert not any(path.name.startswith("tmp_") for path in tmp_path.iterdir())
+
+
+def test_GenerateModelReports_keep_kernel(sample_without_predictorbinning, tmp_path):
+    dm = sample_without_predictorbinning
+    daemons, restarts = [], []
+
+    def fake_render(temp_dir, qmd_file, output_type, output_filename, **kwargs):
+        daemons.append(kwargs["execute_daemon"])
+        restarts.append((temp_dir, kwargs["execute_daemon_restart"]))
+        (temp_dir / output_filename).write_text("")
+
+    dm._run_quarto_command = fake_render
+    model_list = dm.modelData.select("ModelID").unique().collect()["ModelID"]
+    model_list = model_list.cast(str).to_list()[:4]
+    dm.generate_model_reports(model_list=model_list, working_dir=tmp_path, n_workers=2)
+    assert daemons == [dm.quarto_daemon_timeout] * 4
+    # Only the first render of each worker starts a fresh kernel
+    first_renders = {}
+    for worker, restart in restarts:
+        assert restart == (worker not in first_renders)
+        first_renders.setdefault(worker, restart)
+    assert len(first_renders) == 2
+    daemons.clear()
+    dm.generate_model_reports(model_list=model_list, working_dir=tmp_path, n_workers=4)
+    assert daemons == [None] * 4
+
+
+def test_GenerateHealthCheck_bundle(tmp_path):
+    import yaml
+
+    dm = ADMDatamart(
+        path=f"{basePath}/data",
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+    )
+
+    def fake_render(temp_dir, qmd_file, output_type, output_filename, **kwargs):
+        with open(temp_dir / "params.yaml") as f:
+            bundle = yaml.safe_load(f)["health_check_data_dir"]
+        data = ADMDatamart.read_health_check_data(bundle)
+        assert "predictors_per_configuration" in data
+        (temp_dir / output_filename).write_text(bundle)
+
+    dm._run_quarto_command = fake_render
+    report = dm.generate_health_check(working_dir=tmp_path)
+    assert report.read_text().endswith("health_check_data")
+
+
+def test_ModelReport_reuses_batch_datamart(tmp_path):
+    import copy
+    import os
+    import re
+    import shutil
+
+    import polars as pl
+
+    from pdstools import __reports__
+
+    qmd = (__reports__ / "ModelReport.qmd").read_text()
+    data_cell = next(
+        cell
+        for cell in re.findall(r"```\{python\}\n(.*?)```", qmd, re.S)
+        if "_batch_datamart" in cell
+    )
+    loaded = []
+
+    class CountingDatamart(ADMDatamart):
+        def __init__(self, *args, **kwargs):
+            loaded.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    data_kwargs = dict(
+        path=str(tmp_path),
+        model_filename="Data-Decision-ADM-ModelSnapshot_pyModelSnapshots_20210526T131808_GMT.zip",
+        predictor_filename="Data-Decision-ADM-PredictorBinningSnapshot_pyADMPredictorSnapshots_20210526T133622_GMT.zip",
+    )
+    for file in [data_kwargs["model_filename"], data_kwargs["predictor_filename"]]:
+        shutil.copy(f"{basePath}/data/{file}", tmp_path)
+    kernel = dict(
+        ADMDatamart=CountingDatamart,
+        copy=copy,
+        os=os,
+        pl=pl,
+        polars_col_exists=lambda df, col: col in df.collect_schema().names(),
+    )
+    model_ids = (
+        ADMDatamart(**data_kwargs)
+        .predictorData.select(pl.col("ModelID").unique().sort())
+        .collect()
+        .get_column("ModelID")
+        .cast(pl.Utf8)[:2]
+    )
+    # Two renders in the same, kept alive, kernel
+    for model_id in model_ids:
+        kernel["kwargs"] = dict(
+            data_kwargs, model_id=model_id, only_active_predictors=False
+        )
+        exec(data_cell, kernel)
+        models = kernel["datamart"].modelData.select("ModelID").unique().collect()
+        assert models.get_column("ModelID").cast(pl.Utf8).to_list() == [model_id]
+    assert len(loaded) == 1
+
+    # Different data in the same path is read again
+    shutil.copy(tmp_path / data_kwargs["model_filename"], tmp_path / "other.zip")
+    exec(data_cell, kernel)
+    assert len(loaded) == 2